@@ -0,0 +1,222 @@
+import os
+import pickle
+import sqlite3
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+# stays below SQLITE_MAX_VARIABLE_NUMBER of old SQLite builds
+CHUNK_SIZE = 500
+
+
+def _chunks(keys):
+    for start in range(0, len(keys), CHUNK_SIZE):
+        yield keys[start:start + CHUNK_SIZE]
+
+
+class SQLiteCache(BaseCache):
+    """Cache shared by all worker processes through one SQLite file.
+
+    Entries over MAX_ENTRIES or MAX_SIZE (bytes of pickled values) are
+    evicted least recently used first.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 0))
+        # rows hold their last access time; it is rewritten at most once
+        # per this many seconds so that reads rarely turn into writes
+        self._lru_resolution = float(options.get('LRU_RESOLUTION', 1))
+        self._cull_interval = int(options.get('CULL_INTERVAL', 20))
+        # names this cache in the hit and miss metrics
+        self._label = options.get('LABEL', 'default')
+        self._sets = 0
+        self._conn = None
+        self._pid = None
+
+    @property
+    def connection(self):
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=30,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _expiry(self, timeout):
+        # BaseCache already turns the timeout into an absolute timestamp
+        return self.get_backend_timeout(timeout)
+
+    def _dumps(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _fetch(self, keys):
+        """Returns {key: value} for live keys and refreshes their LRU time"""
+        now = time.time()
+        rows = []
+        for chunk in _chunks(keys):
+            placeholders = ','.join('?' * len(chunk))
+            rows += self.connection.execute(
+                f'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({placeholders})', chunk).fetchall()
+        found, expired, touched = {}, [], []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                expired.append(key)
+                continue
+            found[key] = pickle.loads(value)
+            if now - accessed >= self._lru_resolution:
+                touched.append((now, key))
+        if expired:
+            self._delete(expired)
+        if touched:
+            self.connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', touched)
+        if found:
+            metrics.CACHE_GETS.inc(len(found), cache=self._label,
+                                   result='hit')
+        if len(keys) > len(found):
+            metrics.CACHE_GETS.inc(len(keys) - len(found), cache=self._label,
+                                   result='miss')
+        return found
+
+    def _delete(self, keys):
+        for chunk in _chunks(keys):
+            placeholders = ','.join('?' * len(chunk))
+            self.connection.execute(
+                f'DELETE FROM cache WHERE key IN ({placeholders})', chunk)
+
+    def _cull(self):
+        conn = self.connection
+        conn.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count, size = conn.execute(
+            'SELECT COUNT(*), TOTAL(LENGTH(value)) FROM cache').fetchone()
+        excess = 0
+        if self._max_entries and count > self._max_entries:
+            excess = count - self._max_entries
+            if self._cull_frequency:
+                excess = max(excess, count // self._cull_frequency)
+        if self._max_size and size > self._max_size:
+            excess = max(excess, int(count * (1 - self._max_size / size)) + 1)
+        if excess:
+            conn.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)', (excess,))
+
+    def _store(self, rows):
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)', rows)
+        self._sets += len(rows)
+        if self._sets >= self._cull_interval:
+            self._sets = 0
+            self._cull()
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._fetch([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        made = {self._key(key, version): key for key in keys}
+        return {made[key]: value
+                for key, value in self._fetch(list(made)).items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires, now = self._expiry(timeout), time.time()
+        self._store([
+            (self._key(key, version), self._dumps(value), expires, now)
+            for key, value in data.items()
+        ])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        conn = self.connection
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT expires FROM cache WHERE key = ?',
+                               (key,)).fetchone()
+            if row is not None and (row[0] is None or row[0] > time.time()):
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed)'
+                ' VALUES (?, ?, ?, ?)',
+                (key, self._dumps(value), self._expiry(timeout), time.time()))
+            return True
+        finally:
+            conn.execute('COMMIT')
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        conn = self.connection
+        # read and write under one write lock, so workers never lose a delta
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value, expires FROM cache WHERE key = ?',
+                (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            conn.execute('UPDATE cache SET value = ? WHERE key = ?',
+                         (self._dumps(value), key))
+            return value
+        finally:
+            conn.execute('COMMIT')
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        cursor = self.connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._expiry(timeout), key, time.time()))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._fetch([key])
+
+    def delete(self, key, version=None):
+        self._delete([self._key(key, version)])
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._delete(keys)
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # the connection is reused by the next request of this thread
+        pass
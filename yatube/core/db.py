@@ -0,0 +1,25 @@
+import sqlite3
+
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Runs settings.SQLITE_PRAGMAS on a new SQLite connection; they are
+    per connection, so every process and thread gets them"""
+    if connection.vendor != 'sqlite':
+        return
+    # straight on the sqlite3 connection: the pragmas are not queries of
+    # the request, so query budgets and profiles do not count them
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def copy_sqlite(source, target):
+    """Copies a consistent snapshot of an SQLite database file, committed
+    WAL pages included, even while other processes use it"""
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
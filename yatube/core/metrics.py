@@ -0,0 +1,274 @@
+import atexit
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.conf import settings
+
+# Each process adds to its own numbers in memory and, once it serves
+# requests, writes them to METRICS_DIR/<pid>-<token>.json now and then;
+# /metrics sums the files of all processes, so a counter never depends on
+# which worker is scraped. The token tells apart processes that got the
+# same pid; the numbers of exited ones are folded into EXITED
+_lock = threading.Lock()
+_metrics = {}
+_values = {}
+_pid = os.getpid()
+_token = uuid.uuid4().hex[:8]
+_flushed = time.monotonic()
+_serving = False
+
+EXITED = 'exited.json'
+_PROCESS_FILE = re.compile(r'^(\d+)-[0-9a-f]+\.json$')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        _metrics[name] = self
+
+    def describe(self):
+        return {'kind': self.kind, 'help': self.documentation,
+                'labels': self.labels}
+
+    def _key(self, labels):
+        return self.name, tuple(str(labels[label]) for label in self.labels)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            _reset_after_fork()
+            _values[key] = _values.get(key, 0) + amount
+        _maybe_flush()
+
+
+class Histogram(Metric):
+    """Counts observations per bucket; the last two cells are +Inf, sum"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def describe(self):
+        return dict(super().describe(), buckets=self.buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            _reset_after_fork()
+            cells = _values.get(key)
+            if cells is None:
+                cells = _values[key] = [0] * (len(self.buckets) + 2)
+            cells[index] += 1
+            cells[-1] += value
+        _maybe_flush()
+
+
+def serve():
+    """Starts writing the numbers of this process; MetricsMiddleware calls
+    it once a server loads it, so commands and shells write nothing"""
+    global _serving
+    _serving = True
+
+
+def _reset_after_fork():
+    # a forked worker starts with a copy of its parent's numbers
+    global _pid, _token
+    if _pid != os.getpid():
+        _pid = os.getpid()
+        _token = uuid.uuid4().hex[:8]
+        _values.clear()
+
+
+def _write(name, data):
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = os.path.join(settings.METRICS_DIR, name)
+    with open(f'{path}.part', 'w') as part:
+        json.dump(data, part)
+    os.replace(f'{path}.part', path)
+
+
+def _read(path):
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        # written by a process that died mid-write, or removed since
+        return None
+
+
+def _own():
+    with _lock:
+        _reset_after_fork()
+        return f'{_pid}-{_token}.json', {
+            'metrics': {name: metric.describe()
+                        for name, metric in _metrics.items()},
+            'values': [[name, labels, value]
+                       for (name, labels), value in _values.items()],
+        }
+
+
+def flush():
+    """Writes the numbers of this process for the other processes"""
+    global _flushed
+    _flushed = time.monotonic()
+    _write(*_own())
+
+
+def _maybe_flush():
+    if (_serving and time.monotonic() - _flushed
+            >= settings.METRICS_FLUSH_INTERVAL):
+        flush()
+
+
+@atexit.register
+def _flush_at_exit():
+    if _serving and _values:
+        flush()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # a process of another user took the pid
+        pass
+    return True
+
+
+def _add(described, values, data):
+    described.update(data['metrics'])
+    for name, labels, value in data['values']:
+        key = name, tuple(labels)
+        if isinstance(value, list):
+            total = values.setdefault(key, [0] * len(value))
+            for index, cell in enumerate(value):
+                total[index] += cell
+        else:
+            values[key] = values.get(key, 0) + value
+
+
+def _exited(name):
+    match = _PROCESS_FILE.match(name)
+    return match is not None and not _alive(int(match.group(1)))
+
+
+def _prune():
+    """Folds the files of exited processes into EXITED, so that their
+    counts stay without a file per process ever started"""
+    if not any(_exited(entry.name)
+               for entry in os.scandir(settings.METRICS_DIR)):
+        return
+    with open(os.path.join(settings.METRICS_DIR, 'prune.lock'), 'w') as lock:
+        # one process at a time folds files and rewrites EXITED
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        exited = [entry.path for entry in os.scandir(settings.METRICS_DIR)
+                  if _exited(entry.name)]
+        described, values = {}, {}
+        for path in [os.path.join(settings.METRICS_DIR, EXITED), *exited]:
+            data = _read(path)
+            if data is not None:
+                _add(described, values, data)
+        _write(EXITED, {
+            'metrics': described,
+            'values': [[name, list(labels), value]
+                       for (name, labels), value in values.items()],
+        })
+        for path in exited:
+            os.remove(path)
+
+
+def collect():
+    """Sums the files of every process: (descriptions, values)"""
+    own, data = _own()
+    described, values = {}, {}
+    _add(described, values, data)
+    if not os.path.isdir(settings.METRICS_DIR):
+        return described, values
+    _prune()
+    for entry in os.scandir(settings.METRICS_DIR):
+        # this process counts from memory, newer than its file
+        if entry.name.endswith('.json') and entry.name != own:
+            data = _read(entry.path)
+            if data is not None:
+                _add(described, values, data)
+    return described, values
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+            '\n', r'\n')) for name, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition():
+    """Every metric in the Prometheus text format"""
+    described, values = collect()
+    lines = []
+    for name in sorted(described):
+        meta = described[name]
+        lines.append(f'# HELP {name} {meta["help"]}')
+        lines.append(f'# TYPE {name} {meta["kind"]}')
+        for (sample, labels), value in sorted(values.items()):
+            if sample != name:
+                continue
+            if meta['kind'] != 'histogram':
+                lines.append(
+                    f'{name}{_labels(meta["labels"], labels)} '
+                    f'{_number(value)}')
+                continue
+            cumulative = 0
+            bounds = [_number(bound) for bound in meta['buckets']] + ['+Inf']
+            for bound, count in zip(bounds, value[:-1]):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket'
+                    f'{_labels(meta["labels"], labels, [("le", bound)])} '
+                    f'{cumulative}')
+            lines.append(f'{name}_sum{_labels(meta["labels"], labels)} '
+                         f'{_number(value[-1])}')
+            lines.append(f'{name}_count{_labels(meta["labels"], labels)} '
+                         f'{cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_SECONDS = Histogram(
+    'yatube_request_duration_seconds', 'Time spent in a view.', ('view',))
+REQUEST_QUERIES = Histogram(
+    'yatube_request_queries', 'SQL queries run by one request.', ('view',),
+    buckets=QUERY_BUCKETS)
+RESPONSES = Counter(
+    'yatube_responses_total', 'Responses by view and status code.',
+    ('view', 'status'))
+CACHE_GETS = Counter(
+    'yatube_cache_gets_total', 'Cache lookups by cache and result.',
+    ('cache', 'result'))
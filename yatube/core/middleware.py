@@ -0,0 +1,214 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics, routers
+
+logger = logging.getLogger('yatube.profiling')
+
+# Profile of the request being handled by this thread or task
+_current = ContextVar('request_profile', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """A view ran more SQL queries than settings.QUERY_BUDGETS allows"""
+
+
+class Profile:
+    def __init__(self):
+        self.queries = Counter()
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.queries.values())
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries[(sql, repr(params))] += 1
+
+
+def record_render(seconds):
+    """Adds a template render to the profile of the current request"""
+    profile = _current.get()
+    if profile is not None:
+        profile.template_time += seconds
+
+
+def _counted(cache, profile):
+    """Counts hits and misses of one cache instance for this request"""
+    get, get_many = cache.get, cache.get_many
+    missing = object()
+
+    def counted_get(key, default=None, version=None):
+        value = get(key, missing, version=version)
+        if value is missing:
+            profile.cache_misses += 1
+            return default
+        profile.cache_hits += 1
+        return value
+
+    def counted_get_many(keys, version=None):
+        found = get_many(keys, version=version)
+        profile.cache_hits += len(found)
+        profile.cache_misses += len(keys) - len(found)
+        return found
+
+    cache.get, cache.get_many = counted_get, counted_get_many
+    return lambda: (vars(cache).pop('get'), vars(cache).pop('get_many'))
+
+
+def _wrapped(wrapper):
+    """Installs an execute wrapper on every database connection"""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+    return stack
+
+
+class ProfilingMiddleware:
+    """Measures SQL, templates and cache use of every request.
+
+    The numbers go to a Server-Timing header and a JSON log line; a view
+    over its QUERY_BUDGETS entry is logged, or raises under
+    QUERY_BUDGETS_STRICT so that tests fail. Template times come from
+    the core.template_backends backend.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = Profile()
+        token = _current.set(profile)
+        restores = [_counted(caches[alias], profile)
+                    for alias in settings.CACHES]
+        start = time.perf_counter()
+        try:
+            with _wrapped(profile.record_query):
+                response = self.get_response(request)
+        finally:
+            for restore in restores:
+                restore()
+            _current.reset(token)
+        total = time.perf_counter() - start
+        view = getattr(request.resolver_match, 'view_name', None)
+        response['Server-Timing'] = self.server_timing(profile, total)
+        self.log(request, response, view, profile, total)
+        self.check_budget(view, profile)
+        return response
+
+    def server_timing(self, profile, total):
+        return ', '.join((
+            f'db;dur={profile.sql_time * 1000:.1f};'
+            f'desc="{profile.query_count} queries, '
+            f'{profile.duplicates} duplicates"',
+            f'tpl;dur={profile.template_time * 1000:.1f}',
+            f'cache;desc="{profile.cache_hits} hits, '
+            f'{profile.cache_misses} misses"',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+    def log(self, request, response, view, profile, total):
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'queries': profile.query_count,
+            'duplicate_queries': profile.duplicates,
+            'sql_ms': round(profile.sql_time * 1000, 3),
+            'template_ms': round(profile.template_time * 1000, 3),
+            'cache_hits': profile.cache_hits,
+            'cache_misses': profile.cache_misses,
+            'total_ms': round(total * 1000, 3),
+        }, sort_keys=True))
+
+    def check_budget(self, view, profile):
+        budget = settings.QUERY_BUDGETS.get(view)
+        if budget is None or profile.query_count <= budget:
+            return
+        message = (f'{view} ran {profile.query_count} queries, '
+                   f'its budget is {budget}')
+        if settings.QUERY_BUDGETS_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class MetricsMiddleware:
+    """Feeds the latency and query count of every view to core.metrics"""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        metrics.serve()
+
+    def __call__(self, request):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with _wrapped(count):
+            response = self.get_response(request)
+        view = getattr(request.resolver_match, 'view_name', None)
+        if view is not None:
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                            view=view)
+            metrics.REQUEST_QUERIES.observe(queries, view=view)
+            metrics.RESPONSES.inc(view=view, status=response.status_code)
+        return response
+
+
+class ReplicaMiddleware:
+    """Routes the reads of each request to a replica (core.routers).
+
+    A request that writes sets a cookie, and the reads of the requests
+    carrying it stay on the primary for REPLICA_PIN_SECONDS; the page a
+    form redirects to then shows the new post or comment even before
+    the replicas have caught up.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = routers.start(
+            pinned=settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.finish(token)
+        if wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                samesite='Lax')
+        return response
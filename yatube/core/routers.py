@@ -0,0 +1,111 @@
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Routing:
+    """Where the reads of one request go"""
+
+    def __init__(self, replica):
+        # None once the reads must see the primary
+        self.replica = replica
+        self.wrote = False
+
+
+# Routing of the request handled by this thread or task
+_current = ContextVar('request_routing', default=None)
+# Apps always read from the primary: a session or a user created after
+# the replicas were last synced must still log the user in
+PRIMARY_APPS = {'auth', 'sessions'}
+
+
+def start(pinned=False):
+    """Sends the reads of a request to one replica, the same for all of
+    them, unless it is pinned to the primary; returns the token of
+    finish()"""
+    replicas = settings.DATABASE_REPLICAS
+    replica = None if pinned or not replicas else random.choice(replicas)
+    return _current.set(Routing(replica))
+
+
+def finish(token):
+    """Ends the routing of a request; True if the request wrote"""
+    routing = _current.get()
+    _current.reset(token)
+    return routing.wrote
+
+
+def _synced_key(alias):
+    return f'replica-synced:{alias}'
+
+
+def mark_synced(alias, when):
+    """Records that the replica holds every write committed before when
+    (a timestamp), e.g. after sync_replicas copied the primary"""
+    cache.set(_synced_key(alias), when, None)
+
+
+def synced(alias):
+    """Time up to which the replica holds the primary's writes: the one
+    recorded by mark_synced(), or else REPLICA_PIN_SECONDS ago, the lag
+    replicas are assumed to stay within"""
+    when = cache.get(_synced_key(alias))
+    if when is None:
+        when = time.time() - settings.REPLICA_PIN_SECONDS
+    return when
+
+
+def read_primary_after(changed):
+    """Sends the rest of the request's reads to the primary when its
+    replica may not hold a change made at changed (a timestamp) yet.
+
+    Cache versions are the times of the last changes, so a request that
+    fills a cache under a fresh version renders rows of the primary and
+    never stores a lagging replica's under it.
+    """
+    routing = _current.get()
+    if (routing is not None and routing.replica is not None
+            and synced(routing.replica) < changed):
+        routing.replica = None
+
+
+class ReplicaRouter:
+    """Reads of a request go to a replica (settings.DATABASE_REPLICAS),
+    writes always go to the primary.
+
+    Only requests read from replicas, through core.middleware
+    .ReplicaMiddleware; commands and background threads read from the
+    primary. A write sends the rest of the request's reads to the
+    primary, so that it reads what it has just written. Sessions and
+    users (PRIMARY_APPS) are always read from the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _current.get()
+        if routing is None or routing.replica is None:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _current.get()
+        if routing is not None:
+            routing.replica = None
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas are copies of the primary and are never migrated
+        return db not in settings.DATABASE_REPLICAS
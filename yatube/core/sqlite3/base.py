@@ -0,0 +1,14 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite whose transactions take the write lock when they begin.
+
+    A deferred transaction asks for the lock at its first write, and
+    when another connection holds it then, SQLite fails at once with
+    "database is locked" instead of waiting out the timeout, as waiting
+    could deadlock. BEGIN IMMEDIATE makes writers queue for the lock.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,30 @@
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as backend
+
+from . import middleware
+
+
+class Template(backend.Template):
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            middleware.record_render(time.perf_counter() - start)
+
+
+class DjangoTemplates(backend.DjangoTemplates):
+    """Django templates whose top-level renders count in the profile of
+    the request (core.middleware.ProfilingMiddleware); {% include %}
+    renders inside them"""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            backend.reraise(exc, self)
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+from core.cache import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        options.setdefault('CULL_INTERVAL', 1)
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_entries_are_shared_between_instances(self):
+        """Второй экземпляр (другой процесс) видит те же записи"""
+        self.cache.set('page', {'html': '<p>cached</p>'})
+        other = self.make_cache()
+        self.assertEqual(other.get('page'), {'html': '<p>cached</p>'})
+        other.delete('page')
+        self.assertIsNone(self.cache.get('page'))
+
+    def test_expired_entries_are_missing(self):
+        """Просроченная запись не возвращается"""
+        self.cache.set('short', 1, timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 2))
+        self.assertFalse(self.cache.add('short', 3))
+        self.assertEqual(self.cache.get('short'), 2)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """При переполнении удаляются давно не читанные записи"""
+        cache = self.make_cache(MAX_ENTRIES=3, CULL_FREQUENCY=0,
+                                LRU_RESOLUTION=0)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual(cache.get_many(['a', 'b', 'c', 'd']),
+                         {'a': 'a', 'c': 'c', 'd': 'd'})
+
+    def test_size_limit(self):
+        """Общий размер значений не превышает MAX_SIZE"""
+        cache = self.make_cache(MAX_SIZE=4096, LRU_RESOLUTION=0)
+        for num in range(10):
+            cache.set(f'blob_{num}', b'x' * 1024)
+        self.assertLessEqual(len(cache.get_many(
+            [f'blob_{num}' for num in range(10)])), 4)
+        self.assertEqual(cache.get('blob_9'), b'x' * 1024)
+
+    def test_incr(self):
+        """incr атомарно увеличивает существующее значение"""
+        self.cache.set('hits', 1)
+        self.assertEqual(self.cache.incr('hits', 2), 3)
+        self.assertEqual(self.make_cache().get('hits'), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import tempfile
+
+from django.db import connection, connections, transaction
+from django.test import (SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+
+from core.db import copy_sqlite
+
+
+class SQLitePragmasTests(SimpleTestCase):
+    def connect(self, path):
+        """Новое соединение с файлом базы, как у рабочего процесса"""
+        default = connections['default']
+        wrapper = type(default)(dict(default.settings_dict, NAME=path))
+        self.addCleanup(wrapper.close)
+        return wrapper.cursor()
+
+    def pragma(self, cursor, name):
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={
+        'journal_mode': 'wal', 'synchronous': 'normal',
+        'cache_size': -2000, 'busy_timeout': 1234})
+    def test_pragmas_run_on_connect(self):
+        """Каждое новое соединение получает прагмы из настроек"""
+        with tempfile.TemporaryDirectory() as directory:
+            cursor = self.connect(os.path.join(directory, 'db.sqlite3'))
+            self.assertEqual(self.pragma(cursor, 'journal_mode'), 'wal')
+            self.assertEqual(self.pragma(cursor, 'synchronous'), 1)
+            self.assertEqual(self.pragma(cursor, 'cache_size'), -2000)
+            self.assertEqual(self.pragma(cursor, 'busy_timeout'), 1234)
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_no_pragmas(self):
+        """Без профиля остаются настройки SQLite по умолчанию"""
+        with tempfile.TemporaryDirectory() as directory:
+            cursor = self.connect(os.path.join(directory, 'db.sqlite3'))
+            self.assertEqual(self.pragma(cursor, 'journal_mode'), 'delete')
+
+    def test_copy_sqlite(self):
+        """Копия базы для реплики содержит зафиксированные данные"""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'db.sqlite3')
+            target = os.path.join(directory, 'replica.sqlite3')
+            db = sqlite3.connect(source)
+            db.execute('PRAGMA journal_mode=wal')
+            db.execute('CREATE TABLE post (text TEXT)')
+            db.execute("INSERT INTO post VALUES ('Привет')")
+            db.commit()
+            copy_sqlite(source, target)
+            db.close()
+            replica = sqlite3.connect(target)
+            self.addCleanup(replica.close)
+            self.assertEqual(
+                replica.execute('SELECT text FROM post').fetchall(),
+                [('Привет',)])
+
+
+class ImmediateTransactionTests(TransactionTestCase):
+    def test_transactions_begin_immediate(self):
+        """Транзакция сразу берёт блокировку записи"""
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                pass
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
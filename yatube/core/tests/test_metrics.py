@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+
+User = get_user_model()
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            METRICS_DIR=self.directory, METRICS_TOKEN='secret')
+        self.settings_override.enable()
+        self.counter = metrics.Counter('test_events_total', 'Events.',
+                                       ('kind',))
+        self.histogram = metrics.Histogram('test_seconds', 'Timings.',
+                                           buckets=(0.1, 1))
+
+    def tearDown(self):
+        for name in ('test_events_total', 'test_seconds'):
+            del metrics._metrics[name]
+            for key in [key for key in metrics._values if key[0] == name]:
+                del metrics._values[key]
+        self.settings_override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_text_exposition(self):
+        """Счётчики и гистограммы выводятся в текстовом формате."""
+        self.counter.inc(kind='a')
+        self.counter.inc(2, kind='a')
+        self.histogram.observe(0.05)
+        self.histogram.observe(0.5)
+        self.histogram.observe(5)
+        text = metrics.exposition()
+        self.assertIn('# TYPE test_events_total counter', text)
+        self.assertIn('test_events_total{kind="a"} 3', text)
+        self.assertIn('# TYPE test_seconds histogram', text)
+        self.assertIn('test_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{le="1"} 2', text)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn('test_seconds_sum 5.55', text)
+        self.assertIn('test_seconds_count 3', text)
+
+    def test_processes_are_summed(self):
+        """Числа других процессов складываются с числами этого."""
+        self.counter.inc(kind='a')
+        metrics.flush()
+        with open(os.path.join(self.directory, '0.json'), 'w') as other:
+            json.dump({
+                'metrics': {'test_events_total': self.counter.describe()},
+                'values': [['test_events_total', ['a'], 4],
+                           ['test_events_total', ['b'], 1]],
+            }, other)
+        described, values = metrics.collect()
+        self.assertEqual(values['test_events_total', ('a',)], 5)
+        self.assertEqual(values['test_events_total', ('b',)], 1)
+
+    def test_exited_processes_are_folded(self):
+        """Файлы завершившихся процессов сводятся в один, числа остаются."""
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        data = {
+            'metrics': {'test_events_total': self.counter.describe()},
+            'values': [['test_events_total', ['a'], 4]],
+        }
+        for token in ('aa', 'bb'):
+            path = os.path.join(self.directory, f'{process.pid}-{token}.json')
+            with open(path, 'w') as exited:
+                json.dump(data, exited)
+        described, values = metrics.collect()
+        self.assertEqual(values['test_events_total', ('a',)], 8)
+        self.assertEqual(sorted(name for name in os.listdir(self.directory)
+                                if name.endswith('.json')), [metrics.EXITED])
+        described, values = metrics.collect()
+        self.assertEqual(values['test_events_total', ('a',)], 8)
+
+    @override_settings(METRICS_FLUSH_INTERVAL=0)
+    def test_only_servers_write(self):
+        """Процесс без MetricsMiddleware (команды, shell) не пишет файлов."""
+        with mock.patch.object(metrics, '_serving', False):
+            self.counter.inc(kind='a')
+        self.assertEqual(os.listdir(self.directory), [])
+        with mock.patch.object(metrics, '_serving', True):
+            self.counter.inc(kind='a')
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_views_and_cache_are_measured(self):
+        """Время страниц и попадания в кэш фрагментов попадают в метрики."""
+        caches['default'].clear()
+        Client().get(reverse('posts:index'))
+        Client().get(reverse('posts:index'))
+        described, values = metrics.collect()
+        timings = values['yatube_request_duration_seconds', ('posts:index',)]
+        self.assertGreaterEqual(sum(timings[:-1]), 2)
+        self.assertGreaterEqual(
+            values['yatube_cache_gets_total', ('fragments', 'hit')], 1)
+        self.assertIn(('yatube_request_queries', ('posts:index',)), values)
+
+    def test_endpoint_is_protected(self):
+        """/metrics отдаётся только персоналу или с токеном."""
+        url = reverse('metrics')
+        self.assertEqual(Client().get(url).status_code, 302)
+        response = Client().get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE yatube_request_duration_seconds histogram',
+                      response.content)
+        self.assertEqual(
+            Client().get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code,
+            302)
+        staff = Client()
+        staff.force_login(User.objects.create_user('admin', is_staff=True))
+        self.assertEqual(staff.get(url).status_code, 200)
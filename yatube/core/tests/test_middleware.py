@@ -0,0 +1,54 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import Profile
+
+User = get_user_model()
+
+
+# the budgets are strict in tests and test_budgets checks them
+@override_settings(PROFILING_ENABLED=True, QUERY_BUDGETS={})
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_server_timing_header(self):
+        """Ответ несёт заголовок Server-Timing с числом запросов."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'queries', 'duplicates', 'tpl;dur=',
+                       'cache;desc=', 'total;dur='):
+            self.assertIn(metric, timing)
+
+    def test_log_line(self):
+        """Каждый запрос пишет одну JSON-строку в лог."""
+        with self.assertLogs('yatube.profiling', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'posts:index')
+        self.assertEqual(line['status'], 200)
+        self.assertGreater(line['queries'], 0)
+        self.assertGreater(line['template_ms'], 0)
+        self.assertGreater(line['cache_hits'] + line['cache_misses'], 0)
+
+    def test_duplicates_are_counted(self):
+        """Повторённый запрос считается дубликатом."""
+        profile = Profile()
+        with connection.execute_wrapper(profile.record_query):
+            User.objects.filter(username='dup').exists()
+            User.objects.filter(username='dup').exists()
+            User.objects.filter(username='other').exists()
+        self.assertEqual(profile.query_count, 3)
+        self.assertEqual(profile.duplicates, 1)
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled_by_default(self):
+        """Без настройки заголовок не добавляется."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
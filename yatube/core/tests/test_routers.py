@@ -0,0 +1,194 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection, connections, router
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from core import routers
+from core.middleware import ReplicaMiddleware
+from posts import caching, counters, stats
+from posts.models import Group, Post
+
+User = get_user_model()
+
+REPLICAS = ['replica1', 'replica2']
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTests(SimpleTestCase):
+    def test_outside_requests_everything_goes_to_primary(self):
+        """Команды и фоновые потоки читают с основной базы"""
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertEqual(router.db_for_write(Post), 'default')
+
+    def test_request_reads_from_one_replica(self):
+        """Все чтения запроса идут на одну реплику"""
+        token = routers.start()
+        try:
+            replica = router.db_for_read(Post)
+            self.assertIn(replica, REPLICAS)
+            self.assertEqual(router.db_for_read(Post), replica)
+        finally:
+            self.assertFalse(routers.finish(token))
+
+    def test_write_pins_the_rest_of_the_request(self):
+        """После записи запрос читает с основной базы"""
+        token = routers.start()
+        try:
+            self.assertEqual(router.db_for_write(Post), 'default')
+            self.assertEqual(router.db_for_read(Post), 'default')
+        finally:
+            self.assertTrue(routers.finish(token))
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_sessions_and_users_are_read_from_primary(self):
+        """Сессии и пользователи читаются с основной базы"""
+        token = routers.start()
+        try:
+            self.assertEqual(router.db_for_read(Session), 'default')
+            self.assertEqual(router.db_for_read(User), 'default')
+        finally:
+            routers.finish(token)
+
+    def test_pinned_request(self):
+        """Закреплённый запрос читает с основной базы"""
+        token = routers.start(pinned=True)
+        try:
+            self.assertEqual(router.db_for_read(Post), 'default')
+        finally:
+            routers.finish(token)
+
+    def test_replicas_are_not_migrated(self):
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+        self.assertFalse(router.allow_migrate('replica1', 'posts'))
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.read_from = []
+
+    def view(self, write):
+        def view(request):
+            if write:
+                router.db_for_write(Post)
+            self.read_from.append(router.db_for_read(Post))
+            return HttpResponse()
+        return ReplicaMiddleware(view)
+
+    def test_write_sets_the_pin_cookie(self):
+        """Запись закрепляет пользователя за основной базой на время"""
+        response = self.view(write=True)(self.factory.post('/create/'))
+        cookie = response.cookies['read_primary']
+        self.assertEqual(cookie['max-age'], 5)
+        self.assertEqual(self.read_from, ['default'])
+
+    def test_reads_do_not_set_the_cookie(self):
+        response = self.view(write=False)(self.factory.get('/'))
+        self.assertNotIn('read_primary', response.cookies)
+        self.assertIn(self.read_from[0], REPLICAS)
+
+    def test_cookie_keeps_reads_on_primary(self):
+        """Редирект после записи показывает свежие данные"""
+        request = self.factory.get('/')
+        request.COOKIES['read_primary'] = '1'
+        self.view(write=False)(request)
+        self.assertEqual(self.read_from, ['default'])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_unused_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaMiddleware(lambda request: HttpResponse())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class StaleReplicaTests(TransactionTestCase):
+    """Реплика — копия базы, снятая до того, как пользователь вошёл и
+    написал пост"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(text='Старый пост', author=self.author)
+        caching.versions(caching.INDEX_SCOPE, *caching.CARD_SCOPES)
+        # seeding the counter would write, and so read the primary
+        counters.post_count(counters.GLOBAL_SCOPE, Post.objects.all())
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'replica.sqlite3')
+        replica = sqlite3.connect(path)
+        connection.ensure_connection()
+        connection.connection.backup(replica)
+        replica.close()
+        connections.databases['replica1'] = dict(
+            connections.databases['default'], NAME=path)
+        self.addCleanup(self.drop_replica)
+        routers.mark_synced('replica1', time.time())
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def drop_replica(self):
+        connections['replica1'].close()
+        delattr(connections._connections, 'replica1')
+        del connections.databases['replica1']
+
+    def test_redirect_after_post_create_shows_the_post(self):
+        """Редирект после публикации показывает пост, хотя реплика
+        отстала, а сессия создана после её копии"""
+        profile = reverse('posts:profile', kwargs={'username': 'Author'})
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': 'Свежий пост'})
+        self.assertRedirects(response, profile,
+                             fetch_redirect_response=False)
+        self.assertIn('read_primary', response.cookies)
+        response = self.client.get(profile)
+        self.assertContains(response, 'Свежий пост')
+        self.assertEqual(response.context['author_stats'].posts_count, 2)
+        # without the cookie, the user is the one of the session on the
+        # primary, and the profile is bumped after the replica's copy
+        del self.client.cookies['read_primary']
+        cache.clear()
+        response = self.client.get(profile)
+        self.assertEqual(response.context['user'], self.author)
+        self.assertContains(response, 'Свежий пост')
+
+    def test_pages_older_than_the_replica_read_it(self):
+        """Страница, не менявшаяся после копии, читается с реплики"""
+        # an update() sends no signals and bumps nothing
+        Post.objects.filter(pk=self.post.pk).update(text='Исправленный')
+        self.assertContains(Client().get(reverse('posts:index')),
+                            'Старый пост')
+
+    def test_guest_page_after_a_bump_is_not_cached_stale(self):
+        """Гостевая страница после изменения читается с основной базы и
+        не сохраняется в кэше со старыми строками под новой версией"""
+        Post.objects.create(text='Свежий пост', author=self.author)
+        guest = Client()
+        self.assertContains(guest.get(reverse('posts:index')), 'Свежий пост')
+        routers.mark_synced('replica1', time.time())
+        self.assertContains(guest.get(reverse('posts:index')), 'Свежий пост')
+
+    def test_counters_are_seeded_from_the_primary(self):
+        """Счётчик, впервые прочитанный на реплике, считается по основной
+        базе"""
+        group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.create(text='Свежий пост', author=self.author,
+                            group=group)
+        token = routers.start()
+        try:
+            self.assertEqual(counters.post_count(
+                counters.group_scope(group.pk), group.posts.all()), 1)
+            self.assertEqual(stats.for_author(
+                User.objects.get(pk=self.author.pk)).posts_count, 2)
+        finally:
+            routers.finish(token)
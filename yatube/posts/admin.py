@@ -1,33 +1,114 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+from . import search
 from .models import Post, Group, Comment, Follow
 
 
+def estimated_count(queryset):
+    """Row count of a whole table from statistics, not a full scan"""
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s',
+                           [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+    # ids only grow, so the largest one bounds the count from above
+    return queryset.model._default_manager.using(queryset.db).aggregate(
+        top=Max('pk'))['top'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Admin paginator that never runs COUNT(*) over a whole big table.
+
+    An unfiltered changelist shows an estimated total; a filtered one
+    counts at most ADMIN_COUNT_LIMIT matches. Either way the changelist
+    labels the total as approximate through count_label.
+    """
+
+    exact = True
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            self.exact = False
+            return estimated_count(queryset)
+        limit = settings.ADMIN_COUNT_LIMIT
+        # one row past the limit tells a capped count from an exact one
+        count = queryset.order_by()[:limit + 1].count()
+        if count > limit:
+            self.exact = False
+            return limit
+        return count
+
+    @cached_property
+    def count_label(self):
+        count = self.count
+        if self.exact:
+            return str(count)
+        if self.object_list.query.where:
+            return f'{count}+'
+        return f'~{count}'
+
+
+class FastChangeListAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # the "N total" link runs one more COUNT(*) over the whole table
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(FastChangeListAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
-    list_editable = ('group',)
+    raw_id_fields = ('author',)
+    autocomplete_fields = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.available():
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        # the full-text index instead of text LIKE '%term%'
+        return queryset.filter(pk__in=search.matching(
+            search_term, settings.ADMIN_COUNT_LIMIT)), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'description')
     prepopulated_fields = {"slug": ("title",)}
-    search_fields = ('description',)
+    search_fields = ('title', 'description')
     empty_value_display = '-пусто-'
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FastChangeListAdmin):
     list_display = ('text', 'post', 'author', 'created')
-    search_fields = ('author',)
-    search_fields = ('post',)
+    list_select_related = ('post', 'author')
+    # exact username lookups use the unique index on auth_user.username
+    search_fields = ('=author__username',)
+    raw_id_fields = ('post', 'author')
+    # newest first along the primary key, not a sort of the whole table
+    ordering = ('-pk',)
     empty_value_display = '-пусто-'
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(FastChangeListAdmin):
     list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('=user__username', '=author__username')
+    raw_id_fields = ('user', 'author')
+    ordering = ('-pk',)
     empty_value_display = '-пусто-'
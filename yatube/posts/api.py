@@ -0,0 +1,263 @@
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import F
+from django.http import (Http404, JsonResponse, QueryDict,
+                         StreamingHttpResponse)
+from django.urls import reverse
+
+from . import export as exports
+from . import feed, ingest
+from .models import Comment, Group, Post, User
+from .paginator import CURSOR_PARAM, CursorPaginator
+
+# Public name of a field: the column it is read from
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+GROUP_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'slug': 'slug',
+    'description': 'description',
+}
+
+
+class BadRequest(Exception):
+    """A query parameter the API cannot serve; answered with 400"""
+
+
+class NotAuthenticated(Exception):
+    """The resource belongs to a signed-in user; answered with 401"""
+
+
+def _error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def api_view(view):
+    """Read-only JSON view: errors come back as JSON, not HTML pages"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            response = _error(405, 'Only GET is allowed.')
+            response['Allow'] = 'GET, HEAD'
+            return response
+        try:
+            return JsonResponse(view(request, *args, **kwargs))
+        except BadRequest as error:
+            return _error(400, str(error))
+        except NotAuthenticated:
+            return _error(401, 'Authentication credentials were not '
+                               'provided.')
+        except Http404:
+            return _error(404, 'Not found.')
+    return wrapper
+
+
+def _fields(request, known, param='fields'):
+    """Names asked for by ?fields=a,b (a sparse fieldset), else all"""
+    wanted = request.GET.get(param)
+    if not wanted:
+        return list(known)
+    names = [name.strip() for name in wanted.split(',') if name.strip()]
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise BadRequest(f'Unknown {param}: {", ".join(unknown)}.')
+    return names
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('limit must be a number.')
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def _image_url(name):
+    return Post._meta.get_field('image').storage.url(name) if name else None
+
+
+def _item(names, row):
+    # rows are plain tuples; the cursor columns after the names are dropped
+    item = dict(zip(names, row))
+    if item.get('image') is not None:
+        item['image'] = _image_url(item['image'])
+    return item
+
+
+def _link(request, cursor, path, query):
+    if cursor is None:
+        return None
+    query = query.copy()
+    query[CURSOR_PARAM] = cursor
+    return request.build_absolute_uri(f'{path}?{query.urlencode()}')
+
+
+def _page(request, queryset, known, field='pub_date', param='fields',
+          path=None, query=None):
+    """One keyset page of queryset, serialized straight from its rows;
+    its links lead to path?query, by default the requested URL"""
+    names = _fields(request, known, param)
+    columns = [known[name] for name in names]
+    # the cursor needs the date and id of every row, asked for or not
+    columns += [column for column in (field, 'id') if column not in columns]
+    date_index, id_index = columns.index(field), columns.index('id')
+    paginator = CursorPaginator(
+        queryset.values_list(*columns), _limit(request), field=field,
+        key=lambda row: (row[date_index], row[id_index]))
+    page = paginator.get_page(request.GET.get(CURSOR_PARAM))
+    path = path or request.path
+    query = request.GET if query is None else query
+    return {
+        'results': [_item(names, row) for row in page],
+        'next': _link(request, page.next_cursor, path, query),
+        'previous': _link(request, page.previous_cursor, path, query),
+    }
+
+
+def _pk(queryset, **lookup):
+    pk = queryset.filter(**lookup).values_list('pk', flat=True).first()
+    if pk is None:
+        raise Http404
+    return pk
+
+
+@api_view
+def posts(request):
+    """Latest posts of the whole site"""
+    return _page(request, Post.objects.all(), POST_FIELDS)
+
+
+@api_view
+def groups(request):
+    """Every group, by title"""
+    names = _fields(request, GROUP_FIELDS)
+    rows = Group.objects.order_by('title', 'pk').values_list(
+        *(GROUP_FIELDS[name] for name in names))
+    return {'results': [dict(zip(names, row)) for row in rows]}
+
+
+@api_view
+def group_posts(request, slug):
+    group_id = _pk(Group.objects, slug=slug)
+    return _page(request, Post.objects.filter(group_id=group_id),
+                 POST_FIELDS)
+
+
+@api_view
+def profile_posts(request, username):
+    author_id = _pk(User.objects, username=username)
+    return _page(request, Post.objects.filter(author_id=author_id),
+                 POST_FIELDS)
+
+
+@api_view
+def post_detail(request, post_id):
+    """The post and the first page of its comments"""
+    names = _fields(request, POST_FIELDS)
+    row = Post.objects.filter(pk=post_id).values_list(
+        *(POST_FIELDS[name] for name in names)).first()
+    if row is None:
+        raise Http404
+    # the following pages of comments come from post_comments
+    query = QueryDict(mutable=True)
+    for name, param in (('fields', 'comment_fields'), ('limit', 'limit')):
+        if param in request.GET:
+            query[name] = request.GET[param]
+    return {
+        'post': _item(names, row),
+        'comments': _page(request, Comment.objects.filter(post_id=post_id),
+                          COMMENT_FIELDS, field='created',
+                          param='comment_fields',
+                          path=reverse('api:post_comments',
+                                       kwargs={'post_id': post_id}),
+                          query=query),
+    }
+
+
+@api_view
+def post_comments(request, post_id):
+    post_id = _pk(Post.objects, pk=post_id)
+    return _page(request, Comment.objects.filter(post_id=post_id),
+                 COMMENT_FIELDS, field='created')
+
+
+@api_view
+def follow(request):
+    """Posts of the authors the signed-in user follows"""
+    if not request.user.is_authenticated:
+        raise NotAuthenticated
+    pulled = feed.pulled_authors(request.user)
+    posts = feed.feed_posts(request.user, pulled)
+    if pulled:
+        # posts of pulled authors have no feed entry to seek on
+        return _page(request, posts, POST_FIELDS)
+    # seeks on the entry's copy of pub_date, through the join of the
+    # feed's own filter: one index range of the user's entries
+    return _page(request, posts.annotate(
+        entry_date=F('feed_entries__pub_date')), POST_FIELDS,
+        field='entry_date')
+
+
+def batch(request):
+    """Imports an NDJSON body of posts and comments (posts.ingest).
+
+    The signed-in session authenticates the request, so CsrfViewMiddleware
+    checks it like any form post: send the csrftoken cookie's value in the
+    X-CSRFToken header. Scripts without a browser use the ingest command.
+    """
+    if request.method != 'POST':
+        response = _error(405, 'Only POST is allowed.')
+        response['Allow'] = 'POST'
+        return response
+    if not request.user.is_authenticated:
+        return _error(401, 'Authentication credentials were not provided.')
+    # the body is read line by line, never as a whole
+    report = ingest.ingest(request, author=request.user,
+                           trusted=request.user.is_staff)
+    return JsonResponse(report.as_dict())
+
+
+def export(request, table):
+    """Streams a whole table to staff as NDJSON or CSV (posts.export);
+    ?since_id= and ?since= export only what came after a watermark"""
+    if request.method not in ('GET', 'HEAD'):
+        response = _error(405, 'Only GET is allowed.')
+        response['Allow'] = 'GET, HEAD'
+        return response
+    if not request.user.is_authenticated:
+        return _error(401, 'Authentication credentials were not provided.')
+    if not request.user.is_staff:
+        return _error(403, 'Only staff may export.')
+    if table not in exports.TABLES:
+        return _error(404, 'Not found.')
+    fmt = request.GET.get('format', 'ndjson')
+    compress = request.GET.get('gzip') == '1'
+    since_id = request.GET.get('since_id')
+    if since_id and not since_id.isdigit():
+        return _error(400, 'since_id must be a number.')
+    try:
+        chunks = exports.stream(
+            table, fmt, compress, since_id=int(since_id) if since_id else None,
+            since=exports.parse_since(request.GET.get('since')))
+    except exports.ExportError as error:
+        return _error(400, str(error))
+    response = StreamingHttpResponse(chunks, content_type=(
+        'application/gzip' if compress else exports.CONTENT_TYPES[fmt]))
+    response['Content-Disposition'] = (
+        f'attachment; filename="{exports.filename(table, fmt, compress)}"')
+    return response
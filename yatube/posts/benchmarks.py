@@ -0,0 +1,273 @@
+import multiprocessing
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import close_old_connections, connection
+from django.db.models import Count
+from django.db.utils import OperationalError
+from django.template.backends.django import DjangoTemplates
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from core.db import copy_sqlite
+
+from . import generator
+from .models import Group, Post, User
+
+PRESETS = {
+    'small': dict(users=200, groups=10, posts=2000, comments=4000,
+                  follows=20),
+    'full': dict(users=10000, groups=100, posts=100000, comments=300000,
+                 follows=100),
+}
+
+
+def seed(users, groups, posts, comments, follows, seed=0):
+    """Fills an empty database with a reproducible data set"""
+    generator.generate(users=users, groups=groups, posts=posts,
+                       comments=comments, follows=follows, seed=seed)
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1,
+                       round(percent / 100 * (len(ordered) - 1)))]
+
+
+def scenarios():
+    """(name, method, url, data, logged in) of every benchmarked view"""
+    author = User.objects.annotate(n=Count('posts')).order_by('-n').first()
+    reader = User.objects.annotate(
+        n=Count('follower')).order_by('-n').first()
+    group = Group.objects.annotate(n=Count('posts')).order_by('-n').first()
+    post = Post.objects.annotate(n=Count('comments')).order_by('-n').first()
+    return reader, (
+        ('index', 'get', reverse('posts:index'), None, False),
+        ('group_list', 'get',
+         reverse('posts:group_list', kwargs={'slug': group.slug}),
+         None, False),
+        ('profile', 'get',
+         reverse('posts:profile', kwargs={'username': author.username}),
+         None, False),
+        ('post_detail', 'get',
+         reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+         None, False),
+        ('follow_index', 'get', reverse('posts:follow_index'), None, True),
+        ('add_comment', 'post',
+         reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+         {'text': 'Benchmark comment'}, True),
+        ('post_create', 'post', reverse('posts:post_create'),
+         {'text': 'Benchmark post'}, True),
+    )
+
+
+def run(repeat=20, cold=True):
+    """Measures every view; returns {name: {metric: value}}"""
+    reader, views = scenarios()
+    guest, member = Client(), Client()
+    member.force_login(reader)
+    results = {}
+    for name, method, url, data, logged_in in views:
+        client = member if logged_in else guest
+        timings, queries = [], []
+        for _ in range(repeat):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                getattr(client, method)(url, data)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured.captured_queries))
+        results[name] = {
+            'queries': max(queries),
+            'p50_ms': round(_percentile(timings, 50), 3),
+            'p90_ms': round(_percentile(timings, 90), 3),
+            'p99_ms': round(_percentile(timings, 99), 3),
+        }
+    return results
+
+
+def compare(results, baseline, tolerance=0.5, check_latency=False):
+    """Lists the regressions of results against a stored baseline"""
+    problems = []
+    for name, expected in baseline.items():
+        actual = results.get(name)
+        if actual is None:
+            continue
+        if actual['queries'] > expected['queries']:
+            problems.append(
+                f"{name}: {actual['queries']} queries, "
+                f"baseline {expected['queries']}")
+        limit = expected['p50_ms'] * (1 + tolerance)
+        if check_latency and actual['p50_ms'] > limit:
+            problems.append(
+                f"{name}: p50 {actual['p50_ms']} ms, "
+                f"baseline {expected['p50_ms']} ms")
+    return problems
+
+
+def _templates(fast):
+    """The project's template engine in development or production mode"""
+    config = settings.TEMPLATES[0]
+    loaders = settings.TEMPLATE_LOADERS
+    if fast:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    return DjangoTemplates({
+        'NAME': 'benchmark', 'DIRS': config['DIRS'], 'APP_DIRS': False,
+        'OPTIONS': dict(config['OPTIONS'], debug=not fast, loaders=loaders),
+    })
+
+
+def render(repeat=50):
+    """p50 render time of the index page, re-reading templates with debug
+    bookkeeping ('debug_ms') and with compiled templates ('cached_ms')"""
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    page_obj = Paginator(Post.objects.select_related('author', 'group'),
+                         settings.PAGE_ON_SIZE).get_page(1)
+    # rows are fetched once, only the rendering is measured; a zero
+    # timeout makes the fragment cache render its block every time
+    list(page_obj)
+    context = {'page_obj': page_obj, 'cache_version': 'benchmark',
+               'cache_timeout': 0}
+    results = {}
+    for name, fast in (('debug_ms', False), ('cached_ms', True)):
+        engine = _templates(fast)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            engine.get_template('posts/index.html').render(context, request)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = round(_percentile(timings, 50), 3)
+    return results
+
+
+def sqlite_profiles():
+    """(pragmas, CONN_MAX_AGE, OPTIONS) of SQLite's defaults and of the
+    settings; the backend stays the one of the settings, so with
+    core.sqlite3 transactions begin IMMEDIATE under both"""
+    database = settings.DATABASES['default']
+    return {
+        'default': ({'journal_mode': 'delete'}, 0, {}),
+        'tuned': (settings.SQLITE_PRAGMAS, database.get('CONN_MAX_AGE', 0),
+                  database.get('OPTIONS', {})),
+    }
+
+
+def _workloads(reader, views, writers):
+    """Requests of the reader processes and of each writer process; every
+    writer follows and unfollows an author of its own"""
+    reads = [view for view in views if view[1] == 'get']
+    posts = [view for view in views if view[1] == 'post']
+    authors = User.objects.exclude(pk=reader.pk).order_by(
+        'pk').values_list('username', flat=True)[:writers]
+    return reads, [posts + [
+        (name, 'get', reverse(f'posts:{name}', kwargs={'username': author}),
+         None, True)
+        for name in ('profile_follow', 'profile_unfollow')]
+        for author in authors]
+
+
+def _worker(role, reader, requests, barrier, seconds, results):
+    # a forked process opens its own connection with the profile's pragmas
+    client = Client()
+    client.force_login(reader)
+    close_old_connections()
+    barrier.wait()
+    deadline = time.perf_counter() + seconds
+    timings, errors = [], 0
+    try:
+        while time.perf_counter() < deadline:
+            _, method, url, data, _ = requests[len(timings) % len(requests)]
+            start = time.perf_counter()
+            try:
+                response = getattr(client, method)(url, data)
+                failed = response.status_code >= 400
+            except OperationalError:
+                # "database is locked": the writer gave up waiting
+                failed = True
+            timings.append((time.perf_counter() - start) * 1000)
+            errors += failed
+            # what the request_finished signal does after a real request:
+            # closes the connection unless CONN_MAX_AGE keeps it open
+            close_old_connections()
+    finally:
+        # the parent waits for every worker, even one that crashed
+        results.put((role, timings, errors))
+
+
+def _run_workers(reader, roles, seconds):
+    """Starts one process per (role, requests) at once; returns
+    {role: (timings, errors)} summed over the processes of each role"""
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(len(roles))
+    results = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(
+            role, reader, requests, barrier, seconds, results))
+        for role, requests in roles]
+    for process in processes:
+        process.start()
+    summed = {role: ([], 0) for role, _ in roles}
+    for _ in processes:
+        role, timings, errors = results.get()
+        summed[role] = (summed[role][0] + timings, summed[role][1] + errors)
+    for process in processes:
+        process.join()
+    return summed
+
+
+def _measure(reader, roles, seconds, pragmas):
+    # no caches, so that every request reaches the database
+    with override_settings(
+            SQLITE_PRAGMAS=pragmas, PAGE_CACHE_ENABLED=False,
+            METRICS_ENABLED=False, CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+        # the journal mode is switched once, before the workers start
+        connection.ensure_connection()
+        connection.close()
+        return _run_workers(reader, roles, seconds)
+
+
+def concurrency(readers=4, writers=2, seconds=5):
+    """Read and write throughput of the SQLite file database with reader
+    and writer processes working at once, under SQLite's defaults and
+    under the production profile; returns {profile: {metric: value}}"""
+    reader, views = scenarios()
+    reads, writes = _workloads(reader, views, writers)
+    roles = [('read', reads)] * readers + [
+        ('write', requests) for requests in writes]
+    original = dict(connection.settings_dict)
+    source = original['NAME']
+    results = {}
+    for profile, (pragmas, max_age, options) in sqlite_profiles().items():
+        connection.close()
+        path = f'{source}.{profile}'
+        copy_sqlite(source, path)
+        connection.settings_dict.update(NAME=path, CONN_MAX_AGE=max_age,
+                                        OPTIONS=options)
+        try:
+            summed = _measure(reader, roles, seconds, pragmas)
+        finally:
+            connection.close()
+            connection.settings_dict.update(
+                NAME=source, CONN_MAX_AGE=original['CONN_MAX_AGE'],
+                OPTIONS=original['OPTIONS'])
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        results[profile] = {}
+        for role, (timings, errors) in summed.items():
+            results[profile].update({
+                f'{role}s_per_s': round((len(timings) - errors) / seconds,
+                                        1),
+                f'{role}_errors': errors,
+                f'{role}_p90_ms': (round(_percentile(timings, 90), 3)
+                                   if timings else None),
+            })
+    return results
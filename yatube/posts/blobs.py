@@ -0,0 +1,99 @@
+import datetime
+import logging
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_with_thumbnails
+
+from . import thumbnails
+from .models import MediaBlob, Post
+
+logger = logging.getLogger(__name__)
+
+# Seconds a claimed file is kept although no post counts it yet
+CLAIM_SECONDS = 10 * 60
+
+
+def _seed(name):
+    """Creates the blob row from a live count; False if it already exists"""
+    if MediaBlob.objects.filter(name=name).exists():
+        return False
+    refs = Post.objects.filter(image=name).count()
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, refs=refs)
+    except IntegrityError:
+        return False
+    return True
+
+
+def acquire(name):
+    """Counts one more post using the stored file; the count replaces
+    the claim of its upload"""
+    if name and not _seed(name):
+        MediaBlob.objects.filter(name=name).update(refs=F('refs') + 1,
+                                                   claimed=None)
+
+
+def release(name):
+    """Counts one post less; the last one takes the file with it"""
+    if not name:
+        return
+    if not _seed(name):
+        MediaBlob.objects.filter(name=name, refs__gt=0).update(
+            refs=F('refs') - 1)
+    transaction.on_commit(lambda: collect(name))
+
+
+def claim(name):
+    """Keeps collect() off a stored file an upload is about to reuse,
+    until the post of the upload is saved and counted"""
+    MediaBlob.objects.filter(name=name).update(claimed=timezone.now())
+
+
+def _delete_file(name):
+    try:
+        # also drops the sorl thumbnails and their key-value entries; the
+        # field file carries the storage the thumbnails were keyed with
+        delete_with_thumbnails(Post(image=name).image)
+        thumbnails.forget(name)
+    except (OSError, SuspiciousFileOperation):
+        logger.warning('Could not delete orphaned media %s', name)
+
+
+def collect(*names):
+    """Deletes the files of the given blobs that no post uses any more"""
+    orphaned = MediaBlob.objects.filter(refs=0)
+    if names:
+        orphaned = orphaned.filter(name__in=names)
+    claimed_since = timezone.now() - datetime.timedelta(
+        seconds=CLAIM_SECONDS)
+    deleted = 0
+    for name in list(orphaned.values_list('name', flat=True)):
+        # the row stays locked until the file is gone, so a claim() of
+        # the same file waits and the upload then stores it again
+        with transaction.atomic():
+            # a post may have picked the file up again since refs hit zero
+            if MediaBlob.objects.filter(name=name, refs=0).exclude(
+                    claimed__gt=claimed_since).delete()[0]:
+                _delete_file(name)
+                deleted += 1
+    return deleted
+
+
+def reconcile():
+    """Recounts every blob from the posts; returns how many drifted"""
+    live = dict(Post.objects.exclude(image='').values('image').annotate(
+        refs=Count('pk')).order_by().values_list('image', 'refs'))
+    drifted = 0
+    for blob in MediaBlob.objects.iterator():
+        refs = live.pop(blob.name, 0)
+        if blob.refs != refs:
+            MediaBlob.objects.filter(pk=blob.pk).update(refs=refs)
+            drifted += 1
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=name, refs=refs) for name, refs in live.items()],
+        ignore_conflicts=True)
+    return drifted + len(live)
@@ -0,0 +1,196 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag, urlencode
+
+from core import routers
+
+from . import feed
+from .models import Follow
+from .paginator import CURSOR_PARAM
+
+
+# Every cached fragment varies on the versions of the scopes it shows;
+# signals bump a scope's version whenever something in it changes
+INDEX_SCOPE = 'index'
+# group titles and slugs are printed on every post card
+GROUPS_SCOPE = 'groups'
+# so are images, as thumbnails once generate_thumbnails has rendered them
+IMAGES_SCOPE = 'images'
+# Scopes of everything a post card shows beyond the post itself
+CARD_SCOPES = (GROUPS_SCOPE, IMAGES_SCOPE)
+# Query parameters the pages of guest_page() read
+PAGE_PARAMS = ('page', CURSOR_PARAM, 'comments_page')
+
+
+def _key(scope):
+    return f'version:{scope}'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def feed_scope(user_id):
+    return f'feed:{user_id}'
+
+
+def post_scopes(post_id, group_id, author_id):
+    """Scopes whose fragments show the post"""
+    scopes = [INDEX_SCOPE, post_scope(post_id), author_scope(author_id)]
+    if group_id is not None:
+        scopes.append(group_scope(group_id))
+    return scopes
+
+
+def _now():
+    return f'{time.time():.6f}'
+
+
+def _token(scope):
+    token = cache.get(_key(scope))
+    if token is None:
+        token = _now()
+        if not cache.add(_key(scope), token, None):
+            token = cache.get(_key(scope), token)
+    return token
+
+
+def version(scope):
+    """Current version token of a scope; cached fragments vary on it.
+
+    Call it before reading what the fragment shows: the reads go to the
+    primary while the request's replica lags behind the version.
+    """
+    token = _token(scope)
+    routers.read_primary_after(float(token))
+    return token
+
+
+def versions(*scopes):
+    """One vary-on string for a fragment that depends on several scopes"""
+    cached = cache.get_many([_key(scope) for scope in scopes])
+    tokens = [cached.get(_key(scope)) or _token(scope) for scope in scopes]
+    if tokens:
+        routers.read_primary_after(max(map(float, tokens)))
+    return ':'.join(tokens)
+
+
+def _set(keys):
+    token = _now()
+    cache.set_many({key: token for key in keys}, None)
+
+
+def bump(*scopes):
+    """Invalidates every fragment cached under these scopes"""
+    if not scopes:
+        return
+    keys = [_key(scope) for scope in scopes]
+    _set(keys)
+    if transaction.get_connection().in_atomic_block:
+        # a reader may cache old rows before the write commits, so bump
+        # again; outside a transaction the write is already visible
+        transaction.on_commit(lambda: _set(keys))
+
+
+def bump_followers(author_id, pulled=None):
+    """Invalidates the cached feeds of everyone following the author.
+
+    Feeds read the posts of pulled authors at read time and vary on
+    their author scope instead (follow_index), so a pulled author's post
+    costs no write per follower. pulled is feed.is_pulled(author_id)
+    when the caller has already read it.
+    """
+    if pulled is None:
+        pulled = feed.is_pulled(author_id)
+    if pulled:
+        return
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True).iterator(chunk_size=settings.FEED_BATCH_SIZE)
+    batch = []
+    for user_id in followers:
+        batch.append(feed_scope(user_id))
+        if len(batch) >= settings.FEED_BATCH_SIZE:
+            bump(*batch)
+            batch = []
+    bump(*batch)
+
+
+def _page_path(request):
+    # other parameters (tracking tags and the like) would only split one
+    # page into many cache entries
+    query = urlencode(sorted((name, request.GET[name])
+                             for name in PAGE_PARAMS if name in request.GET))
+    return f'{request.path}?{query}' if query else request.path
+
+
+def _serve(request, view, args, kwargs, etag):
+    key = f'guest-page:{etag}'
+    cached = cache.get(key)
+    if cached is not None:
+        content, content_type, rendered = cached
+        response = HttpResponse(content, content_type=content_type)
+    else:
+        response = view(request, *args, **kwargs)
+        rendered = time.time()
+        # a page that sets a cookie (a session, a CSRF token) is someone's
+        # own
+        if (response.status_code == 200 and not response.streaming
+                and not response.cookies):
+            cache.set(key, (response.content, response['Content-Type'],
+                            rendered), settings.PAGE_CACHE_TIMEOUT)
+    if response.status_code == 200:
+        response['Last-Modified'] = http_date(rendered)
+    return response
+
+
+def guest_page(scopes):
+    """Caches whole pages for anonymous visitors and answers their
+    conditional GETs with 304.
+
+    scopes(**view_kwargs) lists the scopes the page shows, or None when
+    it would be a 404. The page is stored under their versions and the
+    PAGE_PARAMS of its URL, so it goes stale exactly when they are
+    bumped. The ETag comes from the same key and alone decides on 304s:
+    pages may change several times within the second of an
+    If-Modified-Since date. Last-Modified tells when the page was
+    rendered.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (not settings.PAGE_CACHE_ENABLED
+                    or request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            shown = scopes(**kwargs)
+            if shown is None:
+                return view(request, *args, **kwargs)
+            etag = quote_etag(hashlib.md5(
+                f'{_page_path(request)}|{versions(*shown)}'.encode()
+            ).hexdigest())
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = _serve(request, view, args, kwargs, etag)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                patch_cache_control(response, max_age=0, must_revalidate=True)
+                patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F
+
+from . import stats
+from .models import PostCount, User
+
+GLOBAL_SCOPE = 'all'
+# Scopes with a PostCount row kept up to date by the Post signals; author
+# scopes read AuthorStats, everything else (e.g. follow feeds) is counted
+# live and cached under the version of what it counts
+STORED_PREFIXES = ('group:',)
+AUTHOR_PREFIX = 'author:'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'{AUTHOR_PREFIX}{author_id}'
+
+
+def follow_scope(user_id, version):
+    """The follow feed's scope at a version of the feed's fragments: a
+    post, follow or unfollow bumps the version and so starts a new count"""
+    return f'follow:{user_id}:{version}'
+
+
+def scopes_for(group_id):
+    """Returns the PostCount scopes a post in this group is counted in"""
+    scopes = [GLOBAL_SCOPE]
+    if group_id is not None:
+        scopes.append(group_scope(group_id))
+    return scopes
+
+
+def is_stored(scope):
+    return scope == GLOBAL_SCOPE or scope.startswith(STORED_PREFIXES)
+
+
+def cache_key(scope):
+    return f'post_count:{scope}'
+
+
+def post_count(scope, queryset):
+    """Number of posts in the scope without scanning the table each time"""
+    if scope.startswith(AUTHOR_PREFIX):
+        author = User(pk=int(scope[len(AUTHOR_PREFIX):]))
+        return stats.for_author(author).posts_count
+    if not is_stored(scope):
+        return cache.get_or_set(cache_key(scope), queryset.count,
+                                settings.POST_COUNT_CACHE_TIMEOUT)
+    count = PostCount.objects.filter(
+        scope=scope).values_list('count', flat=True).first()
+    if count is not None:
+        return count
+    # the first read of a scope seeds its counter from a real COUNT(*), on
+    # the primary: a replica's count would be stored and never catch up
+    count = queryset.using(DEFAULT_DB_ALIAS).count()
+    try:
+        with transaction.atomic():
+            PostCount.objects.create(scope=scope, count=count)
+    except IntegrityError:
+        pass
+    return count
+
+
+def change(scopes, delta):
+    """Shifts the counters of already seeded scopes by delta"""
+    if not scopes or not delta:
+        return
+    PostCount.objects.filter(scope__in=scopes).update(
+        count=F('count') + delta)
+
+
+def forget(*scopes):
+    """Drops counters so they get reseeded, e.g. after bulk writes"""
+    cache.delete_many([cache_key(scope) for scope in scopes
+                       if not is_stored(scope)])
+    if scopes:
+        PostCount.objects.filter(scope__in=scopes).delete()
+    else:
+        PostCount.objects.all().delete()
@@ -0,0 +1,76 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from . import benchmarks
+from .models import Follow, PulledAuthor
+
+# "SCAN posts_post" walks a whole table; "SCAN posts_post USING INDEX ..."
+# walks an index in order and stops at the LIMIT
+FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+TEMP_SORT = 'USE TEMP B-TREE'
+# Tables small by nature, e.g. the list of groups, may be scanned
+ALLOWED_SCANS = ('posts_group',)
+
+
+def plan(sql):
+    """Detail lines of SQLite's EXPLAIN QUERY PLAN for a SELECT"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def problems(sql, allowed=ALLOWED_SCANS):
+    """Full table scans and temporary sorts in the plan of sql"""
+    found = []
+    for detail in plan(sql):
+        scan = FULL_SCAN_RE.match(detail)
+        if scan and scan.group(1) not in allowed:
+            found.append(detail)
+        elif detail.startswith(TEMP_SORT):
+            found.append(detail)
+    return found
+
+
+def _explain(report, name, client, method, url, data, allowed):
+    cache.clear()
+    with CaptureQueriesContext(connection) as captured:
+        getattr(client, method)(url, data)
+    for query in captured.captured_queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        found = problems(sql, allowed)
+        if found:
+            report.setdefault(name, []).append((sql, found))
+
+
+def check_views(allowed=ALLOWED_SCANS):
+    """Requests every benchmarked view with a cold cache and explains
+    its SELECTs; returns {view: [(sql, problems)]} of the bad ones.
+
+    The follow feed is also explained as follow_index_pulled, with one
+    of the reader's authors pulled for the length of the request.
+    """
+    reader, views = benchmarks.scenarios()
+    guest, member = Client(), Client()
+    member.force_login(reader)
+    report = {}
+    for name, method, url, data, logged_in in views:
+        _explain(report, name, member if logged_in else guest, method, url,
+                 data, allowed)
+        if name != 'follow_index':
+            continue
+        author_id = Follow.objects.filter(user=reader).values_list(
+            'author_id', flat=True).first()
+        if author_id is None:
+            continue
+        with transaction.atomic():
+            PulledAuthor.objects.get_or_create(author_id=author_id)
+            _explain(report, 'follow_index_pulled', member, method, url,
+                     data, allowed)
+            transaction.set_rollback(True)
+    return report
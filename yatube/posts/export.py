@@ -0,0 +1,107 @@
+import csv
+import datetime as dt
+import io
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, Follow, Post
+
+# name: (model, exported columns, date column of ?since=)
+TABLES = {
+    'posts': (Post, ('id', 'text', 'pub_date', 'author_id', 'group_id',
+                     'image'), 'pub_date'),
+    'comments': (Comment, ('id', 'post_id', 'author_id', 'text', 'created'),
+                 'created'),
+    'follows': (Follow, ('id', 'user_id', 'author_id'), None),
+}
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+FORMATS = tuple(CONTENT_TYPES)
+
+
+class ExportError(ValueError):
+    """Options that cannot describe an export"""
+
+
+def parse_since(value):
+    """A date or a datetime watermark from the command line or a URL"""
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value) or parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ExportError(f"'{value}' is not a date or a datetime")
+    if not isinstance(parsed, dt.datetime):
+        parsed = dt.datetime.combine(parsed, dt.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def rows(table, since_id=None, since=None):
+    """Rows after the watermarks in id order, fetched chunk by chunk"""
+    if table not in TABLES:
+        raise ExportError(f"Unknown table '{table}'")
+    model, columns, date_column = TABLES[table]
+    queryset = model.objects.order_by('pk')
+    if since_id is not None:
+        queryset = queryset.filter(pk__gt=since_id)
+    if since is not None:
+        if date_column is None:
+            raise ExportError(f'{table} have no date to export since')
+        queryset = queryset.filter(**{f'{date_column}__gte': since})
+    # iterator() keeps only one chunk of rows in memory at a time
+    return queryset.values_list(*columns).iterator(
+        chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def _ndjson(columns, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield (encoder.encode(dict(zip(columns, row))) + '\n').encode()
+
+
+def _csv(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(value.isoformat() if hasattr(value, 'isoformat')
+                        else value for value in row)
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _gzip(chunks):
+    # wbits=31 writes the gzip header and trailer around the deflate data
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream(table, fmt='ndjson', compress=False, since_id=None, since=None):
+    """The export as an iterator of bytes, for a file or a response"""
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format '{fmt}'")
+    columns = TABLES.get(table, (None, ()))[1]
+    chunks = (_ndjson if fmt == 'ndjson' else _csv)(
+        columns, rows(table, since_id, since))
+    return _gzip(chunks) if compress else chunks
+
+
+def filename(table, fmt, compress):
+    return f'{table}.{fmt}' + ('.gz' if compress else '')
@@ -0,0 +1,247 @@
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q
+
+from .models import FeedEntry, Follow, Post, PulledAuthor, User
+
+
+def _insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= settings.FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_pulled(author_id):
+    return PulledAuthor.objects.filter(author_id=author_id).exists()
+
+
+def deliver(post):
+    """Pushes a new post into its author's followers' feeds; True if the
+    author is pulled instead"""
+    return post.author_id in deliver_many([post])
+
+
+def deliver_many(posts):
+    """Pushes new posts into the feeds, reading each author's followers
+    once; returns the ids of the pulled authors among them"""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    limit = settings.FEED_FANOUT_LIMIT
+    pulled = set()
+    for author_id, own_posts in by_author.items():
+        if is_pulled(author_id):
+            pulled.add(author_id)
+            continue
+        followers = list(
+            Follow.objects.filter(author_id=author_id).values_list(
+                'user_id', flat=True)[:limit + 1]
+        )
+        if len(followers) > limit:
+            # from now on the followers read this author's posts at read
+            # time; the entries pushed so far stay valid
+            PulledAuthor.objects.get_or_create(author_id=author_id)
+            pulled.add(author_id)
+            continue
+        _insert(FeedEntry(user_id=user_id, post_id=post.pk,
+                          pub_date=post.pub_date)
+                for post in own_posts for user_id in followers)
+    return pulled
+
+
+def backfill(user_id, author_id):
+    """Copies the posts of a newly followed author into the user's feed"""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date').order_by().iterator(
+            chunk_size=settings.FEED_BATCH_SIZE)
+    _insert(FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts)
+
+
+def prune(user_id, author_id):
+    """Removes an unfollowed author's posts from the user's feed"""
+    FeedEntry.objects.filter(
+        user_id=user_id,
+        post__in=Post.objects.filter(author_id=author_id).values('pk')
+    ).delete()
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _followers(**condition):
+    return Follow.objects.values('author_id').annotate(
+        followers=Count('pk')).filter(**condition).values_list(
+            'author_id', flat=True)
+
+
+def demote():
+    """Pushes to the followers of pulled authors again once they have
+    half the FEED_FANOUT_LIMIT or fewer; the half keeps an author near
+    the limit from switching back and forth. Only a full rebuild() fills
+    the pushed entries of their followers"""
+    still_popular = _followers(
+        followers__gt=settings.FEED_FANOUT_LIMIT // 2)
+    return PulledAuthor.objects.exclude(
+        author_id__in=still_popular).delete()[0]
+
+
+def rebuild(user_id=None, users=None):
+    """Refills feeds from the Follow table, e.g. after bulk imports: of
+    one user, of a queryset of users or of everyone. A rebuild of every
+    feed first demotes the pulled authors who have lost their followers;
+    returns how many were demoted"""
+    if user_id is not None:
+        users = User.objects.filter(pk=user_id)
+    demoted = demote() if users is None else 0
+    PulledAuthor.objects.bulk_create(
+        [PulledAuthor(author_id=author_id) for author_id in _followers(
+            followers__gt=settings.FEED_FANOUT_LIMIT)],
+        ignore_conflicts=True)
+    entries = FeedEntry.objects.all()
+    params = ()
+    only_users = ''
+    if users is not None:
+        entries = entries.filter(user__in=users)
+        sql, params = users.values('pk').query.sql_with_params()
+        only_users = f'AND follow.user_id IN ({sql})'
+    entries.delete()
+    # one set-based statement instead of a backfill() per Follow row
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {_table(FeedEntry)} (user_id, post_id, pub_date) '
+            f'SELECT follow.user_id, post.id, post.pub_date '
+            f'FROM {_table(Follow)} follow '
+            f'JOIN {_table(Post)} post ON post.author_id = follow.author_id '
+            f'WHERE follow.author_id NOT IN '
+            f'(SELECT author_id FROM {_table(PulledAuthor)}) {only_users}',
+            params)
+    return demoted
+
+
+def pulled_authors(user):
+    """Followed authors whose posts the feed reads at read time"""
+    return list(
+        Follow.objects.filter(
+            user=user, author__pulled_feed__isnull=False
+        ).values_list('author_id', flat=True)
+    )
+
+
+def _rename(condition, names):
+    """Copy of a Q whose lookups on the fields of names are made on the
+    fields they map to"""
+    renamed = Q()
+    renamed.connector, renamed.negated = condition.connector, condition.negated
+    for child in condition.children:
+        if isinstance(child, Q):
+            child = _rename(child, names)
+        else:
+            field, _, lookup = child[0].partition('__')
+            if field in names:
+                child = ('__'.join(filter(None, (names[field], lookup))),
+                         child[1])
+        renamed.children.append(child)
+    return renamed
+
+
+class MergedFeed:
+    """Posts of a feed that follows pulled authors, newest first.
+
+    The feed entries and the posts of every pulled author are separate
+    streams, each read in order through an index of its own and only as
+    far as the requested slice reaches; the streams are merged in
+    Python. A UNION of them ordered as a whole would sort the entire
+    feed on every page. Supports what the paginators and the API use:
+    filter, order_by, select_related, values_list, slicing and count.
+    """
+
+    ordered = True
+
+    def __init__(self, streams, order=('-pub_date', '-pk'), columns=None):
+        # (queryset, {field: the stream's copy of it, e.g. in its index})
+        self.streams = streams
+        self.order = order
+        self.columns = columns
+
+    def _clone(self, streams, **changes):
+        clone = MergedFeed(streams, self.order, self.columns)
+        for name, value in changes.items():
+            setattr(clone, name, value)
+        return clone
+
+    def filter(self, *conditions, **lookups):
+        condition = Q(*conditions, **lookups)
+        return self._clone([(queryset.filter(_rename(condition, names)),
+                             names) for queryset, names in self.streams])
+
+    def order_by(self, *fields):
+        def field(name, names):
+            bare = name.lstrip('-')
+            return name.replace(bare, names.get(bare, bare))
+        return self._clone([
+            (queryset.order_by(*(field(name, names) for name in fields)),
+             names) for queryset, names in self.streams], order=fields)
+
+    def select_related(self, *fields):
+        return self._clone([(queryset.select_related(*fields), names)
+                            for queryset, names in self.streams])
+
+    def values_list(self, *fields):
+        return self._clone([(queryset.values_list(*fields), names)
+                            for queryset, names in self.streams],
+                           columns=fields)
+
+    def count(self):
+        # the streams never share a post
+        return sum(queryset.count() for queryset, _ in self.streams)
+
+    def _key(self, row):
+        names = ['id' if name.lstrip('-') == 'pk' else name.lstrip('-')
+                 for name in self.order]
+        if self.columns is None:
+            return tuple(getattr(row, name) for name in names)
+        return tuple(row[self.columns.index(name)] for name in names)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        stop = index.stop
+        merged = heapq.merge(
+            *(list(queryset[:stop]) for queryset, _ in self.streams),
+            key=self._key, reverse=self.order[0].startswith('-'))
+        return list(islice(merged, index.start, stop))
+
+
+def feed_posts(user, pulled=None):
+    """Posts of the authors the user follows, newest first; pulled is
+    pulled_authors(user) when the caller has already read it"""
+    if pulled is None:
+        pulled = pulled_authors(user)
+    if not pulled:
+        # ordered by the entry's copy of pub_date: one index range, no sort
+        return Post.objects.filter(feed_entries__user=user).order_by(
+            '-feed_entries__pub_date')
+    # entries pushed before an author was pulled stay, so they are left
+    # to the author's own stream
+    pushed = Post.objects.filter(feed_entries__user=user).exclude(
+        author_id__in=pulled)
+    # the entries are read through their (user, -pub_date, -post) index
+    entry = {'pub_date': 'feed_entries__pub_date',
+             'pk': 'feed_entries__post__id'}
+    return MergedFeed(
+        [(pushed, entry)]
+        + [(Post.objects.filter(author_id=author_id), {})
+           for author_id in pulled]).order_by('-pub_date', '-pk')
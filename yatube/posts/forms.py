@@ -1,7 +1,10 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from .models import Post, Comment
 from django.contrib.auth import get_user_model
 
+from . import images
+
 User = get_user_model()
 
 
@@ -10,6 +13,19 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        """Stores new uploads re-encoded, bounded and without metadata"""
+        image = self.cleaned_data.get('image')
+        post = self.instance
+        if image is False:
+            post.image_width = post.image_height = None
+            post.image_placeholder = ''
+        if not isinstance(image, UploadedFile):
+            return image
+        (normalized, post.image_width, post.image_height,
+         post.image_placeholder) = images.normalize(image)
+        return normalized
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,269 @@
+import datetime
+import multiprocessing
+import random
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections
+from django.db.models import AutoField
+from django.utils import timezone
+
+WORDS = (
+    'день', 'город', 'книга', 'музыка', 'друг', 'погода', 'работа', 'кофе',
+    'кино', 'море', 'лес', 'утро', 'вечер', 'идея', 'dream', 'code',
+    'travel', 'coffee', 'music', 'python', 'django', 'summer', 'winter',
+    'news', 'photo', 'story', 'life', 'weekend', 'garden', 'cat',
+)
+# Set per worker process by _init(); forked workers share it with the parent
+_STATE = {}
+
+
+class GeneratorError(ValueError):
+    """Options the generator refuses to run with"""
+
+
+def _rng(seed, kind, index):
+    # a string seed is hashed the same way everywhere, so every chunk is
+    # reproducible no matter which process generates it
+    return random.Random(f'{seed}:{kind}:{index}')
+
+
+def _pick(rng, ids, alpha):
+    """Power-law pick: the first ids get most of the activity"""
+    if not alpha:
+        return rng.choice(ids)
+    return ids[min(int(rng.paretovariate(alpha)) - 1, len(ids) - 1)]
+
+
+def _text(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _spread(index, total):
+    """Dates grow with the row number and end now"""
+    state = _STATE
+    step = state['days'] * 86400 / max(total, 1)
+    return state['start'] + datetime.timedelta(seconds=index * step)
+
+
+def _users(rng, start, stop):
+    prefix, password = _STATE['prefix'], _STATE['password']
+    return [(f'{prefix}_{num}', password, f'{prefix}_{num}@example.com')
+            for num in range(start, stop)]
+
+
+def _groups(rng, start, stop):
+    prefix = _STATE['prefix']
+    return [(f'{prefix} group {num}', f'{prefix}-{num}', _text(rng, 5, 20))
+            for num in range(start, stop)]
+
+
+def _posts(rng, start, stop):
+    state = _STATE
+    groups = state['group_ids'] + [None]
+    return [(_text(rng, 5, 80), _spread(num, state['posts']),
+             _pick(rng, state['author_order'], state['alpha']),
+             rng.choice(groups))
+            for num in range(start, stop)]
+
+
+def _comments(rng, start, stop):
+    state = _STATE
+    rows = [(_text(rng, 2, 30), _spread(num, state['comments']),
+             _pick(rng, state['post_ids'], state['alpha']),
+             rng.choice(state['user_ids']))
+            for num in range(start, stop)]
+    # only the dates of this chunk's posts are read, never all of them
+    post_dates = dict(apps.get_model('posts.Post').objects.filter(
+        pk__in={row[2] for row in rows}).values_list('pk', 'pub_date'))
+    # never older than the post it is written under
+    return [(text, max(created, post_dates[post_id]), post_id, author_id)
+            for text, created, post_id, author_id in rows]
+
+
+def _follows(rng, start, stop):
+    """Edges of followers start..stop; authors follow a power law"""
+    state = _STATE
+    user_ids, mean = state['user_ids'], state['follows']
+    rows = []
+    for num in range(start, stop):
+        user_id = user_ids[num]
+        wanted = min(int(rng.expovariate(1 / mean)) if mean else 0,
+                     len(user_ids) - 1)
+        authors = set()
+        for _ in range(wanted * 4):
+            if len(authors) >= wanted:
+                break
+            author_id = _pick(rng, state['author_order'], state['alpha'])
+            if author_id in authors:
+                # the popular authors are taken, so pick from the long tail
+                author_id = rng.choice(state['author_order'])
+            if author_id != user_id:
+                authors.add(author_id)
+        rows.extend((user_id, author_id) for author_id in sorted(authors))
+    return rows
+
+
+KINDS = {
+    'users': (_users, 'auth.User', ('username', 'password', 'email')),
+    'groups': (_groups, 'posts.Group', ('title', 'slug', 'description')),
+    'posts': (_posts, 'posts.Post',
+              ('text', 'pub_date', 'author_id', 'group_id')),
+    'comments': (_comments, 'posts.Comment',
+                 ('text', 'created', 'post_id', 'author_id')),
+    'follows': (_follows, 'posts.Follow', ('user_id', 'author_id')),
+}
+
+
+def _values(obj, fields):
+    for field in fields:
+        # pre_save() of an auto_now_add field would put now over the
+        # generated date, so its value is taken as it is
+        value = (getattr(obj, field.attname)
+                 if getattr(field, 'auto_now_add', False)
+                 else field.pre_save(obj, True))
+        yield field.get_db_prep_save(value, connection)
+
+
+def _write(kind, rows):
+    """Inserts the rows with one executemany; like bulk_create without
+    signals, but keeping the generated pub_date and created values"""
+    _, label, columns = KINDS[kind]
+    model = apps.get_model(label)
+    fields = [field for field in model._meta.concrete_fields
+              if not isinstance(field, AutoField)]
+    ops = connection.ops
+    # follow edges may repeat between chunks; the duplicates are skipped
+    sql = (f'{ops.insert_statement(ignore_conflicts=True)} '
+           f'{ops.quote_name(model._meta.db_table)} '
+           f'({", ".join(ops.quote_name(field.column) for field in fields)})'
+           f' VALUES ({", ".join(["%s"] * len(fields))})'
+           f' {ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}')
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            list(_values(model(**dict(zip(columns, row))), fields))
+            for row in rows])
+    return len(rows)
+
+
+def _init(state):
+    if not apps.ready:
+        django.setup()
+    _STATE.update(state)
+
+
+def _chunk(task):
+    """Generates one chunk; writes it too when workers own the writes"""
+    kind, index, start, stop = task
+    rows = KINDS[kind][0](_rng(_STATE['seed'], kind, index), start, stop)
+    if _STATE['workers_write']:
+        return _write(kind, rows)
+    return rows
+
+
+class Generator:
+    """Streams deterministic fake data into the database in batches"""
+
+    def __init__(self, users, groups, posts, comments, follows, seed=0,
+                 workers=1, batch_size=5000, days=365, alpha=1.2,
+                 prefix='gen', password=None, log=None):
+        self.counts = {'users': users, 'groups': groups, 'posts': posts,
+                       'comments': comments}
+        self.state = {
+            'seed': seed, 'batch_size': batch_size, 'days': days,
+            'alpha': alpha, 'prefix': prefix, 'follows': follows,
+            'posts': posts, 'comments': comments,
+            'start': timezone.now() - datetime.timedelta(days=days),
+            'password': make_password(password),
+            # SQLite allows one writer, so there workers only generate rows
+            'workers_write': workers > 1 and connection.vendor != 'sqlite',
+        }
+        self.workers = workers
+        self.log = log or (lambda message: None)
+
+    def _ids(self, label, **filters):
+        return list(apps.get_model(label).objects.filter(
+            **filters).order_by('pk').values_list('pk', flat=True))
+
+    def _tasks(self, kind, total):
+        size = self.state['batch_size']
+        return [(kind, index, start, min(start + size, total))
+                for index, start in enumerate(range(0, total, size))]
+
+    def _stream(self, kind, total):
+        tasks = self._tasks(kind, total)
+        done = 0
+        # the parent writes what SQLite workers generate
+        _init(self.state)
+        if self.workers <= 1:
+            results = map(_chunk, tasks)
+            pool = None
+        else:
+            # forked children must not share the parent's DB connections
+            connections.close_all()
+            pool = multiprocessing.Pool(self.workers, _init, (self.state,))
+            results = pool.imap(_chunk, tasks)
+        try:
+            for result in results:
+                done += result if isinstance(result, int) else _write(
+                    kind, result)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        self.log(f'{kind}: {done}')
+
+    def check(self):
+        """Refuses a prefix an earlier run has used: its users and groups
+        would be skipped as duplicates, but every post and comment would
+        be generated again"""
+        prefix = self.state['prefix']
+        if (apps.get_model('auth.User').objects.filter(
+                username__startswith=f'{prefix}_').exists()
+                or apps.get_model('posts.Group').objects.filter(
+                    slug__startswith=f'{prefix}-').exists()):
+            raise GeneratorError(
+                f"Data with the prefix '{prefix}' already exists; "
+                'pass another --prefix')
+
+    def run(self):
+        self.check()
+        prefix = self.state['prefix']
+        self._stream('users', self.counts['users'])
+        self._stream('groups', self.counts['groups'])
+        user_ids = self._ids('auth.User', username__startswith=f'{prefix}_')
+        author_order = list(user_ids)
+        _rng(self.state['seed'], 'authors', 0).shuffle(author_order)
+        self.state.update(
+            user_ids=user_ids,
+            author_order=author_order,
+            group_ids=self._ids('posts.Group', slug__startswith=f'{prefix}-'),
+        )
+        # the first authors in author_order write most and are followed most
+        self._stream('posts', self.counts['posts'])
+        # and the newest generated posts collect most comments
+        self.state.update(post_ids=self._ids(
+            'posts.Post', author__username__startswith=f'{prefix}_')[::-1])
+        self._stream('comments', self.counts['comments'])
+        self._stream('follows', len(user_ids))
+        self.refresh()
+
+    def refresh(self):
+        """Brings the denormalized data of the generated rows in line with
+        the bulk inserts; the rest of the site keeps its own"""
+        from . import caching, counters, feed, search
+        from .models import AuthorStats, Post
+        users = apps.get_model('auth.User').objects.filter(
+            username__startswith=f'{self.state["prefix"]}_')
+        counters.forget(counters.GLOBAL_SCOPE, *map(
+            counters.group_scope, self.state['group_ids']))
+        AuthorStats.objects.filter(author__in=users).delete()
+        feed.rebuild(users=users)
+        search.index(Post.objects.filter(author__in=users), replace=False)
+        caching.bump(caching.INDEX_SCOPE, caching.GROUPS_SCOPE)
+        self.log('counters, statistics, feeds and search refreshed')
+
+
+def generate(**options):
+    Generator(**options).run()
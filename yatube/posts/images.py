@@ -0,0 +1,100 @@
+import base64
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+# Side of the blurred preview inlined into pages while the image loads
+PLACEHOLDER_SIDE = 16
+
+
+def _format():
+    return 'WEBP' if features.check('webp') else 'JPEG'
+
+
+def _flatten(image, fmt):
+    """Drops palette/CMYK modes; JPEG gets the alpha over white"""
+    has_alpha = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+    if fmt == 'WEBP' and has_alpha:
+        return image.convert('RGBA')
+    if has_alpha:
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image.convert('RGBA'),
+                         mask=image.convert('RGBA').getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, fmt, quality):
+    buffer = BytesIO()
+    # nothing from the original's info (EXIF, GPS, ICC, comments) is passed
+    if fmt == 'WEBP':
+        image.save(buffer, 'WEBP', quality=quality, method=4)
+    else:
+        image.save(buffer, 'JPEG', quality=quality, optimize=True,
+                   progressive=True)
+    return buffer.getvalue()
+
+
+def placeholder(image):
+    """Tiny JPEG of the image as a data URI (a low-quality placeholder)"""
+    preview = _flatten(image, 'JPEG')
+    preview.thumbnail((PLACEHOLDER_SIDE, PLACEHOLDER_SIDE))
+    data = base64.b64encode(_encode(preview, 'JPEG', 40)).decode()
+    return f'data:image/jpeg;base64,{data}'
+
+
+def _invalid():
+    return ValidationError('Загрузите корректное изображение.',
+                           code='invalid_image')
+
+
+def normalize(upload):
+    """Validates an uploaded image and re-encodes it for storage.
+
+    Returns (file, width, height, placeholder). The file fits
+    IMAGE_MAX_SIDE, carries no metadata and is WebP where Pillow supports
+    it, progressive JPEG otherwise.
+
+    The limits apply to an upload Django has already received (spooled to
+    a temporary file past FILE_UPLOAD_MAX_MEMORY_SIZE); request bodies are
+    capped by the web server in front.
+    """
+    if upload.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.',
+            code='file_too_large',
+            params={'limit': settings.IMAGE_MAX_UPLOAD_SIZE // 2 ** 20})
+    upload.seek(0)
+    try:
+        # reads the header only; the pixels are decoded after the checks
+        image = Image.open(upload)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise _invalid()
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Изображение больше %(limit)d мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': settings.IMAGE_MAX_PIXELS // 10 ** 6})
+    try:
+        # animations keep only their first frame
+        image.seek(0)
+        # a truncated or corrupt file only fails here, on decoding
+        image.load()
+        image = ImageOps.exif_transpose(image)
+        side = settings.IMAGE_MAX_SIDE
+        image.thumbnail((side, side), Image.LANCZOS)
+        fmt = _format()
+        image = _flatten(image, fmt)
+        data = _encode(image, fmt, settings.IMAGE_QUALITY)
+    except (Image.DecompressionBombError, OSError, ValueError):
+        raise _invalid()
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    extension = 'webp' if fmt == 'WEBP' else 'jpg'
+    return (ContentFile(data, name=f'{stem}.{extension}'), image.width,
+            image.height, placeholder(image))
@@ -0,0 +1,223 @@
+import json
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import caching, counters, feed, search, stats
+from .forms import CommentForm, PostForm
+from .models import Comment, Group, Post, User
+
+# One NDJSON line is one record:
+#   {"type": "post", "text": "...", "group": "<slug>", "author": "<name>"}
+#   {"type": "comment", "post": <post id>, "text": "...", "author": "<name>"}
+# "group" is optional; "author" defaults to the importing user and may
+# only name someone else when the importer is trusted (staff, the command).
+# A comment's "post" must exist before the import starts: the posts of an
+# import get their ids only as they are inserted
+KINDS = ('post', 'comment')
+# The values that tell apart the rows of a batch on databases that do not
+# return the keys of a bulk insert
+IDENTITY = {
+    Post: ('author_id', 'group_id', 'text', 'pub_date'),
+    Comment: ('author_id', 'post_id', 'text', 'created'),
+}
+
+
+class Report:
+    """What an import created, and why the rejected lines were rejected"""
+
+    def __init__(self):
+        self.created = Counter()
+        self.errors = []
+
+    def reject(self, line, errors):
+        self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': {'posts': self.created['post'],
+                            'comments': self.created['comment']},
+                'errors': self.errors}
+
+
+def _parse(raw):
+    """The record of one line, or the errors that make it unusable"""
+    try:
+        record = json.loads(raw)
+    except ValueError:
+        return None, {'__all__': ['Invalid JSON.']}
+    if not isinstance(record, dict):
+        return None, {'__all__': ['A record must be a JSON object.']}
+    if record.get('type') not in KINDS:
+        return None, {'type': [f'Must be one of: {", ".join(KINDS)}.']}
+    return record, None
+
+
+def _lookups(records):
+    """Everything the records refer to, read with one query per model"""
+    names = {record['author'] for record in records
+             if isinstance(record.get('author'), str)}
+    slugs = {record['group'] for record in records
+             if record['type'] == 'post' and record.get('group')}
+    post_ids = {record['post'] for record in records
+                if record['type'] == 'comment'
+                and isinstance(record.get('post'), int)}
+    return (
+        dict(User.objects.filter(username__in=names).values_list(
+            'username', 'pk')),
+        {slug: (pk, title) for slug, pk, title in Group.objects.filter(
+            slug__in=slugs).values_list('slug', 'pk', 'title')},
+        set(Post.objects.filter(pk__in=post_ids).values_list(
+            'pk', flat=True)),
+    )
+
+
+def _author(name, author_id, authors, trusted):
+    """(author id, error) of a record; it may name someone else"""
+    if name is None:
+        return author_id, (None if author_id else 'This field is required.')
+    if not trusted:
+        return None, 'Only staff may import for other users.'
+    if not isinstance(name, str) or name not in authors:
+        return None, 'No such user.'
+    return authors[name], None
+
+
+def _build(record, author_id, authors, groups, post_ids, trusted):
+    """An unsaved Post or Comment validated by the site's forms, or the
+    errors the forms would show"""
+    errors = {}
+    author_id, error = _author(record.get('author'), author_id, authors,
+                               trusted)
+    if error:
+        errors['author'] = [error]
+    # the forms validate the text; references are checked against the
+    # batch lookups instead of one query per record
+    if record['type'] == 'post':
+        form = PostForm(data={'text': record.get('text')})
+        group = record.get('group')
+        if group and (not isinstance(group, str) or group not in groups):
+            errors['group'] = [PostForm.base_fields[
+                'group'].error_messages['invalid_choice']]
+    else:
+        form = CommentForm(data={'text': record.get('text')})
+        post_id = record.get('post')
+        if not isinstance(post_id, int) or post_id not in post_ids:
+            errors['post'] = ['No such post.']
+    if not form.is_valid():
+        for field, messages in form.errors.get_json_data().items():
+            errors[field] = [message['message'] for message in messages]
+    if errors:
+        return None, errors
+    obj = form.instance
+    obj.author_id = author_id
+    if record['type'] == 'post':
+        obj.group_id = groups[group][0] if group else None
+    else:
+        obj.post_id = post_id
+    return obj, None
+
+
+def _create(model, objs):
+    """bulk_create that leaves the primary keys on objs, also where the
+    database does not return them (SQLite, MySQL)"""
+    if connection.features.can_return_ids_from_bulk_insert:
+        model.objects.bulk_create(objs, batch_size=settings.INGEST_BATCH_SIZE)
+        return
+    last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+    model.objects.bulk_create(objs, batch_size=settings.INGEST_BATCH_SIZE)
+    # other writers may have added rows in between, so the new rows are
+    # read back and told apart by their values, not counted from an id
+    fields = IDENTITY[model]
+    waiting = defaultdict(list)
+    for obj in objs:
+        waiting[tuple(getattr(obj, field) for field in fields)].append(obj)
+    rows = model.objects.filter(
+        pk__gt=last, author_id__in={obj.author_id for obj in objs}
+    ).order_by('pk').values_list('pk', *fields)
+    for pk, *values in rows.iterator():
+        same = waiting.get(tuple(values))
+        if same:
+            same.pop(0).pk = pk
+
+
+def _posts_created(posts, titles):
+    """What the Post signals do for each post, once for the whole batch"""
+    by_scopes = Counter()
+    by_author = Counter()
+    scopes = set()
+    for post in posts:
+        by_scopes.update(counters.scopes_for(post.group_id))
+        by_author[post.author_id] += 1
+        scopes.update(caching.post_scopes(post.pk, post.group_id,
+                                          post.author_id))
+    by_delta = defaultdict(list)
+    for scope, delta in by_scopes.items():
+        by_delta[delta].append(scope)
+    for delta, same in by_delta.items():
+        counters.change(same, delta)
+    for author_id, count in by_author.items():
+        stats.change(author_id, posts_count=count)
+    pulled = feed.deliver_many(posts)
+    if search.available():
+        search.fill([(post.pk, post.text, titles.get(post.group_id))
+                     for post in posts], replace=False)
+    caching.bump(*scopes)
+    for author_id in by_author:
+        caching.bump_followers(author_id, author_id in pulled)
+
+
+def _comments_created(comments):
+    by_author = Counter(comment.author_id for comment in comments)
+    for author_id, count in by_author.items():
+        stats.change(author_id, comments_count=count)
+    caching.bump(*{caching.post_scope(comment.post_id)
+                   for comment in comments},
+                 *{caching.author_scope(author_id) for author_id in by_author})
+
+
+def _flush(batch, author_id, trusted, report):
+    authors, groups, post_ids = _lookups([record for _, record in batch])
+    built = {'post': [], 'comment': []}
+    for line, record in batch:
+        obj, errors = _build(record, author_id, authors, groups, post_ids,
+                             trusted)
+        if errors:
+            report.reject(line, errors)
+        else:
+            built[record['type']].append(obj)
+    if not built['post'] and not built['comment']:
+        return
+    titles = {pk: title for pk, title in groups.values()}
+    with transaction.atomic():
+        if built['post']:
+            _create(Post, built['post'])
+            _posts_created(built['post'], titles)
+        if built['comment']:
+            _create(Comment, built['comment'])
+            _comments_created(built['comment'])
+    report.created.update({kind: len(objs) for kind, objs in built.items()})
+
+
+def ingest(lines, author=None, trusted=False, batch_size=None):
+    """Imports NDJSON lines in batches of one transaction each; a rejected
+    line is reported and does not stop the rest"""
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    author_id = author.pk if author is not None else None
+    report = Report()
+    batch = []
+    for number, raw in enumerate(lines, start=1):
+        if not raw.strip():
+            continue
+        record, errors = _parse(raw)
+        if errors:
+            report.reject(number, errors)
+            continue
+        batch.append((number, record))
+        if len(batch) >= batch_size:
+            _flush(batch, author_id, trusted, report)
+            batch = []
+    if batch:
+        _flush(batch, author_id, trusted, report)
+    return report
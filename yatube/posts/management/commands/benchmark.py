@@ -0,0 +1,96 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmarks, explain
+from posts.models import Post
+
+BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway database and measures latency and SQL '
+            'queries of the posts views against a stored baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=benchmarks.PRESETS,
+                            default='small')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Requests per view')
+        parser.add_argument('--warm', action='store_true',
+                            help='Keep the cache between requests')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Reuse the seeded database next time '
+                                 '(SQLite needs a file DATABASES TEST NAME)')
+        parser.add_argument('--output', help='Write results to this file')
+        parser.add_argument('--baseline', default=BASELINE)
+        parser.add_argument('--update-baseline', action='store_true')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Allowed p50 growth, 0.5 means +50%%')
+        parser.add_argument('--check-latency', action='store_true',
+                            help='Fail on latency, not only query counts')
+        parser.add_argument('--render', action='store_true',
+                            help='Also time the rendering of the index '
+                                 'page with and without compiled templates')
+        parser.add_argument('--explain', action='store_true',
+                            help='Also fail on full scans and temporary '
+                                 'sorts in the query plans of the views')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, keepdb=options['keepdb'])
+        try:
+            # a private cache, so the benchmark never touches real entries
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            }}):
+                if not Post.objects.exists():
+                    self.stdout.write(f"Seeding '{options['preset']}' data")
+                    benchmarks.seed(**benchmarks.PRESETS[options['preset']])
+                results = benchmarks.run(options['repeat'],
+                                         cold=not options['warm'])
+                plans = explain.check_views() if options['explain'] else {}
+                rendering = (benchmarks.render(options['repeat'])
+                             if options['render'] else None)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+        report = {'preset': options['preset'], 'views': results}
+        if rendering is not None:
+            report['render'] = rendering
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(text + '\n')
+        self.stdout.write(text)
+        if plans:
+            raise CommandError('Bad query plans:\n' + '\n'.join(
+                f'{view}: {", ".join(found)}\n  {sql}'
+                for view, items in plans.items() for sql, found in items))
+        if options['update_baseline']:
+            with open(options['baseline'], 'w') as baseline:
+                baseline.write(text + '\n')
+            return
+        self.check_baseline(report, options)
+
+    def check_baseline(self, report, options):
+        if not os.path.exists(options['baseline']):
+            return
+        with open(options['baseline']) as baseline:
+            baseline = json.load(baseline)
+        if baseline.get('preset') != report['preset']:
+            self.stderr.write('Baseline preset differs, comparison skipped')
+            return
+        problems = benchmarks.compare(
+            report['views'], baseline['views'], options['tolerance'],
+            options['check_latency'])
+        if problems:
+            raise CommandError('Regressions:\n' + '\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('No regressions'))
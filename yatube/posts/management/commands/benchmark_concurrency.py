@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway SQLite file and measures read and write '
+            'throughput of reader and writer processes working at once, '
+            'with SQLite defaults and with the production profile')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=benchmarks.PRESETS,
+                            default='small')
+        parser.add_argument('--readers', type=int, default=4,
+                            help='Processes requesting pages')
+        parser.add_argument('--writers', type=int, default=2,
+                            help='Processes posting, commenting and '
+                                 'following')
+        parser.add_argument('--seconds', type=float, default=5,
+                            help='Duration of each run')
+        parser.add_argument('--output', help='Write results to this file')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The benchmark compares SQLite profiles')
+        setup_test_environment()
+        directory = tempfile.mkdtemp()
+        # worker processes share the database, so it must be a file
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            directory, 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            }}):
+                self.stdout.write(f"Seeding '{options['preset']}' data")
+                benchmarks.seed(**benchmarks.PRESETS[options['preset']])
+            results = benchmarks.concurrency(
+                options['readers'], options['writers'], options['seconds'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            os.rmdir(directory)
+        report = {'preset': options['preset'], 'readers': options['readers'],
+                  'writers': options['writers'], 'profiles': results}
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(text + '\n')
+        self.stdout.write(text)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import blobs
+
+
+class Command(BaseCommand):
+    help = ('Recounts which posts use every stored image and deletes the '
+            'files and thumbnails no post uses any more')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only recount, do not delete files')
+
+    def handle(self, *args, **options):
+        drifted = blobs.reconcile()
+        self.stdout.write(f'{drifted} reference counts fixed')
+        if options['dry_run']:
+            return
+        deleted = blobs.collect()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} files deleted'))
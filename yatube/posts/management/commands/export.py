@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = ('Streams posts, comments or follows to NDJSON or CSV without '
+            'loading the table into memory')
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(export.TABLES))
+        parser.add_argument('--format', choices=export.FORMATS,
+                            default='ndjson')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Compress the output with gzip')
+        parser.add_argument('--since-id', type=int,
+                            help='Only rows with a greater id')
+        parser.add_argument('--since',
+                            help='Only rows dated on or after this date')
+        parser.add_argument('--output', default='-',
+                            help="File to write, or '-' for stdout")
+
+    def handle(self, *args, **options):
+        try:
+            chunks = export.stream(
+                options['table'], options['format'], options['gzip'],
+                since_id=options['since_id'],
+                since=export.parse_since(options['since']))
+        except export.ExportError as error:
+            raise CommandError(error)
+        if options['output'] == '-':
+            self.write(sys.stdout.buffer, chunks)
+        else:
+            with open(options['output'], 'wb') as target:
+                self.write(target, chunks)
+
+    def write(self, target, chunks):
+        for chunk in chunks:
+            target.write(chunk)
+        target.flush()
@@ -0,0 +1,50 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import generator
+
+
+class Command(BaseCommand):
+    help = ('Bulk-generates reproducible users, groups, posts, comments '
+            'and follow edges for load testing')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=300000)
+        parser.add_argument('--follows', type=float, default=50,
+                            help='Mean number of authors a user follows')
+        parser.add_argument('--alpha', type=float, default=1.2,
+                            help='Power-law exponent of author popularity; '
+                                 '0 spreads activity uniformly')
+        parser.add_argument('--days', type=int, default=365,
+                            help='Spread publication dates over this period')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int,
+                            default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='gen',
+                            help='Prefix of generated usernames and slugs')
+        parser.add_argument('--password',
+                            help='Password of every generated user; '
+                                 'unusable by default')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            generator.generate(
+                users=options['users'], groups=options['groups'],
+                posts=options['posts'], comments=options['comments'],
+                follows=options['follows'], seed=options['seed'],
+                workers=options['workers'], batch_size=options['batch_size'],
+                days=options['days'], alpha=options['alpha'],
+                prefix=options['prefix'], password=options['password'],
+                log=self.stdout.write,
+            )
+        except generator.GeneratorError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Done in {time.monotonic() - started:.1f}s'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import caching, thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Renders the thumbnail presets of existing post images, '
+            'so that no page resizes an image during a request')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            help='Threads rendering in parallel; '
+                                 'THUMBNAIL_WORKERS by default')
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True).order_by().distinct().iterator()
+        done = 0
+        for done, name in enumerate(
+                thumbnails.generate_many(names, options['workers']), 1):
+            if done % 100 == 0:
+                self.stdout.write(f'{done} images')
+        # cached pages still point at the original files
+        caching.bump(caching.IMAGES_SCOPE)
+        self.stdout.write(self.style.SUCCESS(f'{done} images rendered'))
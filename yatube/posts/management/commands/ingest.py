@@ -0,0 +1,41 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import ingest
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Imports posts and comments from an NDJSON file, one record '
+            'per line, in bulk transactions')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="NDJSON file, or '-' for stdin")
+        parser.add_argument('--author',
+                            help='Username of records without an author')
+        parser.add_argument('--batch-size', type=int,
+                            help='Records per transaction')
+
+    def handle(self, *args, **options):
+        author = None
+        if options['author']:
+            author = User.objects.filter(username=options['author']).first()
+            if author is None:
+                raise CommandError(f"No user '{options['author']}'")
+        if options['path'] == '-':
+            report = self.ingest(sys.stdin, author, options)
+        else:
+            with open(options['path'], encoding='utf-8') as source:
+                report = self.ingest(source, author, options)
+        for error in report.errors:
+            self.stderr.write(json.dumps(error, ensure_ascii=False))
+        created = report.as_dict()['created']
+        self.stdout.write(self.style.SUCCESS(
+            f"{created['posts']} posts and {created['comments']} comments "
+            f"imported, {len(report.errors)} lines rejected"))
+
+    def ingest(self, source, author, options):
+        return ingest.ingest(source, author=author, trusted=True,
+                             batch_size=options['batch_size'])
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = 'Refills the materialized follow feeds from the Follow table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int,
+                            help='Rebuild the feed of one user only')
+
+    def handle(self, *args, **options):
+        demoted = feed.rebuild(options['user_id'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Feeds rebuilt, {demoted} pulled authors pushed again'))
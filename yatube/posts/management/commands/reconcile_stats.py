@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = 'Recounts stored author statistics and fixes the drifted ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many users drifted')
+
+    def handle(self, *args, **options):
+        fixed = stats.reconcile(dry_run=options['dry_run'])
+        verb = 'drifted' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'{fixed} users {verb}'))
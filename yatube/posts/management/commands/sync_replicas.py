@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import routers
+from core.db import copy_sqlite
+
+
+class Command(BaseCommand):
+    help = ('Copies the SQLite database into every DATABASE_REPLICAS file, '
+            'standing in for replication on a single machine')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No DATABASE_REPLICAS configured')
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Only SQLite files can be copied; other '
+                               'databases replicate on their own')
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections[alias]
+            # the replica's own connection must not hold the old file open
+            replica.close()
+            started = time.time()
+            copy_sqlite(primary.settings_dict['NAME'],
+                        replica.settings_dict['NAME'])
+            # caches may now store renders of this replica under versions
+            # bumped before the copy
+            routers.mark_synced(alias, started)
+            self.stdout.write(f"{alias}: {replica.settings_dict['NAME']}")
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(settings.DATABASE_REPLICAS)} replicas synced'))
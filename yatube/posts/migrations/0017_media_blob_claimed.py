@@ -0,0 +1,18 @@
+# Generated by Django 2.2.19 on 2026-10-18 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediablob',
+            name='claimed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .storage import ContentAddressedStorage
+
 
 User = get_user_model()
 
@@ -26,14 +28,32 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    # set on upload (posts.images), so rendering never opens the file;
+    # width_field would read every legacy image on each model load
+    image_width = models.PositiveIntegerField(null=True, blank=True,
+                                              editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True,
+                                               editable=False)
+    # data URI shown blurred until the image itself is loaded
+    image_placeholder = models.TextField(blank=True, editable=False)
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ['-pub_date']
+        # group and profile pages read one range of these backwards; an
+        # ascending pub_date walked backwards yields (-pub_date, -id),
+        # the cursor paginator's order, which a DESC column cannot
+        indexes = [
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_pub_date_idx'),
+        ]
         verbose_name = 'Post'
         verbose_name_plural = 'Posts'
 
@@ -67,6 +87,10 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -88,8 +112,100 @@ class Follow(models.Model):
                 name='unique user-author pair'
             )
         ]
+        # the unique pair serves "whom a user follows"; this one serves
+        # "who follows an author" for feeds and follower counts
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
         verbose_name = 'Subscriptions'
         verbose_name_plural = 'Subscriptions'
 
     def __str__(self):
         return f'{self.user}'
+
+
+class PostCount(models.Model):
+    """Stored number of posts in a scope: all posts, a group or an author"""
+    scope = models.CharField(max_length=64, unique=True)
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.scope}: {self.count}'
+
+
+class FeedEntry(models.Model):
+    """A post pushed into a follower's feed when it was published"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    # copy of post.pub_date, so a feed page is one range over the index
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique user-post feed entry'
+            )
+        ]
+        indexes = [
+            # the post breaks ties in the order of merged feeds
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_user_pub_date_post_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.post_id}'
+
+
+class PulledAuthor(models.Model):
+    """Author with too many followers to push posts to; feeds pull them"""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='pulled_feed'
+    )
+
+    def __str__(self):
+        return f'{self.author}'
+
+
+class AuthorStats(models.Model):
+    """Stored activity numbers of a user, kept in sync by signals"""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Author statistics'
+        verbose_name_plural = 'Author statistics'
+
+    def __str__(self):
+        return f'{self.author}'
+
+
+class MediaBlob(models.Model):
+    """A stored upload and the number of posts using it"""
+    name = models.CharField(max_length=255, unique=True)
+    refs = models.PositiveIntegerField(default=0)
+    # when an upload last reused the file, before its post was saved
+    claimed = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.refs}'
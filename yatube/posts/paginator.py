@@ -1,8 +1,162 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
 from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from . import counters
+
+CURSOR_PARAM = 'cursor'
+
+
+def encode_cursor(post, backwards=False):
+    """Packs the (pub_date, id) key of a post into an opaque token"""
+    return encode_key(post.pub_date, post.pk, backwards)
+
+
+def encode_key(date, pk, backwards=False):
+    """Packs a (date, id) keyset position into an opaque token"""
+    payload = [date.isoformat(), pk, int(backwards)]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Returns (pub_date, id, backwards) or None for a broken token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        pub_date, pk, backwards = json.loads(raw.decode())
+        pub_date = parse_datetime(pub_date)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if pub_date is None or not isinstance(pk, int):
+        return None
+    return pub_date, pk, bool(backwards)
+
+
+class CursorPage(Sequence):
+    """Keyset page that mimics the parts of Page used by the templates"""
+    is_cursor = True
+
+    def __init__(self, object_list, cursor=None, next_cursor=None,
+                 previous_cursor=None):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        # {% cache %} fragments vary on str(page_obj), so keep it unique
+        return f'<CursorPage at {self.cursor or "start"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Seeks by an indexed (pub_date, id) key instead of COUNT and OFFSET.
+
+    field names another date column; key(row) returns the (date, id) of
+    a row when the rows are not model instances, e.g. values_list() rows.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date', key=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.field = field
+        self.key = key or (lambda row: (getattr(row, field), row.pk))
+
+    def _seek(self, date, pk, lookup):
+        return (Q(**{f'{self.field}__{lookup}': date})
+                | Q(**{self.field: date, f'pk__{lookup}': pk}))
+
+    def get_page(self, token=None):
+        newest_first = (f'-{self.field}', '-pk')
+        cursor = decode_cursor(token) if token else None
+        if cursor is None:
+            rows = self._fetch(self.object_list.order_by(*newest_first))
+            return self._build(rows, None, has_next=len(rows) > self.per_page,
+                               has_previous=False)
+        date, pk, backwards = cursor
+        if not backwards:
+            rows = self._fetch(
+                self.object_list.filter(
+                    self._seek(date, pk, 'lt')).order_by(*newest_first)
+            )
+            return self._build(rows, token, has_next=len(rows) > self.per_page,
+                               has_previous=True)
+        rows = self._fetch(
+            self.object_list.filter(
+                self._seek(date, pk, 'gt')).order_by(self.field, 'pk')
+        )
+        has_previous = len(rows) > self.per_page
+        return self._build(rows[:self.per_page][::-1], token, has_next=True,
+                           has_previous=has_previous)
+
+    def _fetch(self, queryset):
+        # one extra row tells whether there is anything behind this page
+        return list(queryset[:self.per_page + 1])
+
+    def _build(self, rows, token, has_next, has_previous):
+        rows = rows[:self.per_page]
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_key(*self.key(rows[-1]))
+        if rows and has_previous:
+            previous_cursor = encode_key(*self.key(rows[0]), backwards=True)
+        return CursorPage(rows, token, next_cursor, previous_cursor)
+
+
+class CountedPaginator(Paginator):
+    """Paginator that takes its total from the post counters"""
+
+    def __init__(self, object_list, per_page, scope, total=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.scope = scope
+        self.total = total
+
+    @cached_property
+    def count(self):
+        if self.total is not None:
+            return self.total
+        return counters.post_count(self.scope, self.object_list)
+
+    def page(self, number):
+        # the stored total may lag behind, so never cut a page short by it
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self)
 
 
-def paginate_page(request, post_list):
-    paginator = Paginator(post_list, settings.PAGE_ON_SIZE)
+def paginate_page(request, post_list, scope=None, total=None):
+    """Pages post_list; scope names the counter used for the total,
+    total passes a number the view has already read"""
+    if (settings.PAGINATION_MODE == 'cursor'
+            or CURSOR_PARAM in request.GET):
+        paginator = CursorPaginator(post_list, settings.PAGE_ON_SIZE)
+        return paginator.get_page(request.GET.get(CURSOR_PARAM))
+    if scope is None:
+        paginator = Paginator(post_list, settings.PAGE_ON_SIZE)
+    else:
+        paginator = CountedPaginator(post_list, settings.PAGE_ON_SIZE, scope,
+                                     total)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
@@ -0,0 +1,168 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .stemmer import stems
+
+# SQLite FTS5 table; rowid is the post id, the columns hold stemmed words
+TABLE = 'posts_post_search'
+CREATE_TABLE = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+    f"text, title, tokenize='unicode61 remove_diacritics 2')"
+)
+# bm25 weights of the text and the group title columns
+RANK = f'bm25({TABLE}, 1.0, 0.5)'
+BATCH_SIZE = 1000
+
+
+def available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def document(text, title):
+    return ' '.join(stems(text)), ' '.join(stems(title or ''))
+
+
+def match_query(query):
+    """FTS5 query matching every stemmed word; the last one as a prefix"""
+    terms = stems(query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def fill(rows, using=connection, replace=True):
+    """Indexes (post id, text, group title) rows, replacing old entries"""
+    # one transaction, not one per row
+    with transaction.atomic(using=using.alias), using.cursor() as cursor:
+        batch = []
+        for pk, text, title in rows:
+            batch.append((pk, *document(text, title)))
+            if len(batch) >= BATCH_SIZE:
+                _write(cursor, batch, replace)
+                batch = []
+        _write(cursor, batch, replace)
+
+
+def _write(cursor, batch, replace):
+    if not batch:
+        return
+    if replace:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s',
+                           [(row[0],) for row in batch])
+    cursor.executemany(
+        f'INSERT INTO {TABLE} (rowid, text, title) VALUES (%s, %s, %s)',
+        batch)
+
+
+def index(posts, replace=True):
+    """(Re)indexes the posts of a queryset"""
+    if not available():
+        return
+    fill(posts.values_list('pk', 'text', 'group__title').order_by().iterator(
+        chunk_size=BATCH_SIZE), replace=replace)
+
+
+def index_post(post, created=False):
+    """Indexes one saved post from the instance, without reading it back"""
+    if not available():
+        return
+    title = post.group.title if post.group_id is not None else None
+    fill([(post.pk, post.text, title)], replace=not created)
+
+
+def remove(post_ids):
+    if not available() or not post_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s',
+                           [(pk,) for pk in post_ids])
+
+
+def prune(using=connection):
+    """Drops the entries of posts that no longer exist"""
+    if (not available(using)
+            or TABLE not in using.introspection.table_names()):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid NOT IN '
+                       f'(SELECT id FROM {Post._meta.db_table})')
+
+
+def rebuild():
+    """Reindexes every post, e.g. after bulk imports"""
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    index(Post.objects.all(), replace=False)
+
+
+def matching(query, limit):
+    """Subquery of the ids of at most limit newest posts matching query,
+    for filter(pk__in=...)"""
+    match = match_query(query)
+    if match is None:
+        return RawSQL('SELECT NULL WHERE 0', [])
+    return RawSQL(f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+                  f'ORDER BY rowid DESC LIMIT %s', [match, limit])
+
+
+class SearchResults:
+    """Posts matching a query, best first; sliced lazily by a Paginator"""
+
+    def __init__(self, query):
+        self.query = query
+        self.match = match_query(query)
+
+    def _fallback(self):
+        # other databases scan the table word by word
+        condition = Q()
+        for word in self.query.split():
+            condition &= Q(text__icontains=word) | Q(
+                group__title__icontains=word)
+        return Post.objects.filter(condition)
+
+    def count(self):
+        if self.match is None:
+            return 0
+        if not available():
+            return min(self._fallback().count(), settings.SEARCH_MAX_HITS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM (SELECT rowid FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s LIMIT %s)',
+                [self.match, settings.SEARCH_MAX_HITS])
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if self.match is None:
+            return []
+        if not available():
+            return list(self._fallback().select_related(
+                'author', 'group')[index])
+        # only the newest SEARCH_CANDIDATES matches are ranked, through a
+        # rowid range FTS5 walks without scoring the older ones, and
+        # pages stop after the best SEARCH_MAX_HITS of them
+        start = index.start or 0
+        stop = min(index.stop, settings.SEARCH_MAX_HITS)
+        if start >= stop:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+                f'AND rowid >= (SELECT MIN(rowid) FROM ('
+                f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+                f'ORDER BY rowid DESC LIMIT %s)) '
+                f'ORDER BY {RANK}, rowid DESC LIMIT %s OFFSET %s',
+                [self.match, self.match, settings.SEARCH_CANDIDATES,
+                 stop - start, start])
+            ids = [row[0] for row in cursor.fetchall()]
+        found = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [found[pk] for pk in ids if pk in found]
@@ -0,0 +1,175 @@
+from django.db import connections
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import blobs, caching, counters, feed, search, stats, thumbnails
+from .models import Comment, Follow, Group, Post
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_keys(sender, instance, **kwargs):
+    """Keeps the group, author and image an edited post had before the save"""
+    if instance._state.adding or instance.pk is None:
+        return
+    old = Post.objects.filter(pk=instance.pk).values_list(
+        'group_id', 'author_id', 'image').first()
+    if old is not None:
+        instance._old_keys = old[:2]
+        instance._old_image = old[2]
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    scopes = counters.scopes_for(instance.group_id)
+    if created:
+        counters.change(scopes, 1)
+        stats.change(instance.author_id, posts_count=1)
+        instance._pulled = feed.deliver(instance)
+        return
+    old_group_id, old_author_id = getattr(
+        instance, '_old_keys', (instance.group_id, instance.author_id))
+    old_scopes = counters.scopes_for(old_group_id)
+    counters.change([s for s in old_scopes if s not in scopes], -1)
+    counters.change([s for s in scopes if s not in old_scopes], 1)
+    if old_author_id != instance.author_id:
+        stats.change(old_author_id, posts_count=-1)
+        stats.change(instance.author_id, posts_count=1)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, created, **kwargs):
+    name = instance.image.name
+    if name and (created or getattr(instance, '_old_image', None) != name):
+        thumbnails.schedule(name)
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, created, **kwargs):
+    name = instance.image.name
+    old_name = '' if created else getattr(instance, '_old_image', name)
+    if name != old_name:
+        blobs.acquire(name)
+        blobs.release(old_name)
+
+
+@receiver(post_migrate)
+def prune_search_index(sender, using, **kwargs):
+    # flush (and so every TransactionTestCase) empties the posts table but
+    # not the search table, whose entries would match new posts by id
+    if sender.name == 'posts':
+        search.prune(connections[using])
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, created, **kwargs):
+    search.index_post(instance, created)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.remove([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    blobs.release(instance.image.name)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change(counters.scopes_for(instance.group_id), -1)
+    stats.change(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_fragments(sender, instance, **kwargs):
+    scopes = caching.post_scopes(instance.pk, instance.group_id,
+                                 instance.author_id)
+    old_keys = getattr(instance, '_old_keys', None)
+    if old_keys:
+        scopes += caching.post_scopes(instance.pk, *old_keys)
+    caching.bump(*scopes)
+    # set by count_saved_post for new posts only; a later save reads it
+    caching.bump_followers(instance.author_id,
+                           vars(instance).pop('_pulled', None))
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.author_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    stats.change(instance.author_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_fragments(sender, instance, **kwargs):
+    # the commenter's profile shows how many comments they wrote
+    caching.bump(caching.post_scope(instance.post_id),
+                 caching.author_scope(instance.author_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_fragments(sender, instance, **kwargs):
+    caching.bump(caching.GROUPS_SCOPE, caching.group_scope(instance.pk))
+
+
+@receiver(post_delete, sender=Group)
+def forget_group_count(sender, instance, **kwargs):
+    counters.forget(counters.group_scope(instance.pk))
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.author_id, followers_count=1)
+        stats.change(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    stats.change(instance.author_id, followers_count=-1)
+    stats.change(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    feed.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_fragments(sender, instance, **kwargs):
+    caching.bump(caching.feed_scope(instance.user_id),
+                 caching.author_scope(instance.author_id))
+
+
+@receiver(post_save, sender=Group)
+def reindex_group_posts(sender, instance, created, **kwargs):
+    if not created:
+        # the group title is indexed along with every post of the group
+        search.index(instance.posts.all())
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    instance._post_ids = list(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def reindex_ungrouped_posts(sender, instance, **kwargs):
+    search.index(Post.objects.filter(
+        pk__in=getattr(instance, '_post_ids', [])))
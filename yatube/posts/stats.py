@@ -0,0 +1,75 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+FIELDS = ('posts_count', 'comments_count', 'followers_count',
+          'following_count')
+
+
+def _counted(model, field):
+    """Subquery counting the rows of model that point at the outer user"""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def live_counts(users):
+    """Annotates users with their real numbers in one query"""
+    return users.annotate(
+        posts_count=_counted(Post, 'author'),
+        comments_count=_counted(Comment, 'author'),
+        followers_count=_counted(Follow, 'author'),
+        following_count=_counted(Follow, 'user'),
+    ).values_list('pk', *FIELDS)
+
+
+def for_author(author):
+    """Stored numbers of the author; the first read seeds them from the
+    primary, as a replica's numbers would be stored and never catch up"""
+    try:
+        return author.stats
+    except AuthorStats.DoesNotExist:
+        pk, *numbers = live_counts(User.objects.using(
+            DEFAULT_DB_ALIAS).filter(pk=author.pk)).get()
+        stats, _ = AuthorStats.objects.get_or_create(
+            author=author, defaults=dict(zip(FIELDS, numbers)))
+        author.stats = stats
+        return stats
+
+
+def change(author_id, **deltas):
+    """Shifts the seeded numbers of a user, e.g. change(1, posts_count=1)"""
+    AuthorStats.objects.filter(author_id=author_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def _fix(rows, dry_run):
+    stored = {
+        row[0]: row[1:] for row in AuthorStats.objects.filter(
+            author_id__in=[row[0] for row in rows]
+        ).values_list('author_id', *FIELDS)
+    }
+    drifted = [row for row in rows
+               if row[0] in stored and tuple(row[1:]) != stored[row[0]]]
+    if not dry_run:
+        for pk, *numbers in drifted:
+            AuthorStats.objects.filter(author_id=pk).update(
+                **dict(zip(FIELDS, numbers)))
+    return len(drifted)
+
+
+def reconcile(users=None, dry_run=False, batch_size=1000):
+    """Rewrites drifted numbers; returns how many users were fixed"""
+    if users is None:
+        users = User.objects.all()
+    fixed, rows = 0, []
+    for row in live_counts(users.order_by('pk')).iterator(
+            chunk_size=batch_size):
+        rows.append(row)
+        if len(rows) >= batch_size:
+            fixed += _fix(rows, dry_run)
+            rows = []
+    return fixed + _fix(rows, dry_run)
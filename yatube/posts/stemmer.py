@@ -0,0 +1,129 @@
+"""Light stemming of Russian (Snowball) and English words for the search."""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('[а-я]')
+
+
+def _endings(*words):
+    # the longest ending has to be tried first
+    return tuple(sorted(words, key=len, reverse=True))
+
+
+PERFECTIVE_GERUND_1 = _endings('в', 'вши', 'вшись')
+PERFECTIVE_GERUND_2 = _endings('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись')
+ADJECTIVE = _endings(
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им',
+    'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая',
+    'яя', 'ою', 'ею')
+PARTICIPLE_1 = _endings('ем', 'нн', 'вш', 'ющ', 'щ')
+PARTICIPLE_2 = _endings('ивш', 'ывш', 'ующ')
+REFLEXIVE = _endings('ся', 'сь')
+VERB_1 = _endings(
+    'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+    'ют', 'ны', 'ть', 'ешь', 'нно')
+VERB_2 = _endings(
+    'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+    'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+    'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю')
+NOUN = _endings(
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я')
+SUPERLATIVE = _endings('ейш', 'ейше')
+DERIVATIONAL = _endings('ост', 'ость')
+ENGLISH = (
+    ('ational', 'ate'), ('ization', 'ize'), ('fulness', 'ful'),
+    ('iveness', 'ive'), ('ousness', 'ous'), ('ingly', ''), ('edly', ''),
+    ('ments', ''), ('ment', ''), ('ness', ''), ('ings', ''), ('ing', ''),
+    ('ies', 'y'), ('ied', 'y'), ('ly', ''), ('ed', ''), ('es', ''),
+    ('s', ''),
+)
+
+
+def _strip(word, endings, preceded_by=None):
+    """Removes the first matching ending; returns None if none matched"""
+    for ending in endings:
+        if not word.endswith(ending):
+            continue
+        stem = word[:-len(ending)]
+        if preceded_by is None or stem.endswith(preceded_by):
+            return stem
+    return None
+
+
+def _regions(word):
+    """Start of RV and R2 as in the Snowball Russian stemmer"""
+    rv = next((i + 1 for i, c in enumerate(word) if c in VOWELS), len(word))
+    r1 = next((i + 1 for i in range(1, len(word))
+               if word[i] not in VOWELS and word[i - 1] in VOWELS),
+              len(word))
+    r2 = next((i + 1 for i in range(r1 + 1, len(word))
+               if word[i] not in VOWELS and word[i - 1] in VOWELS),
+              len(word))
+    return rv, r2
+
+
+def _russian(word):
+    word = word.replace('ё', 'е')
+    rv, r2 = _regions(word)
+    head, rest = word[:rv], word[rv:]
+    stem = (_strip(rest, PERFECTIVE_GERUND_1, ('а', 'я'))
+            or _strip(rest, PERFECTIVE_GERUND_2))
+    if stem is None:
+        rest = _strip(rest, REFLEXIVE) or rest
+        stem = _strip(rest, ADJECTIVE)
+        if stem is not None:
+            stem = (_strip(stem, PARTICIPLE_1, ('а', 'я'))
+                    or _strip(stem, PARTICIPLE_2) or stem)
+        else:
+            stem = (_strip(rest, VERB_1, ('а', 'я'))
+                    or _strip(rest, VERB_2))
+            if stem is None:
+                stem = _strip(rest, NOUN)
+                if stem is None:
+                    stem = rest
+    rest = stem[:-1] if stem.endswith('и') else stem
+    derived = _strip(rest, DERIVATIONAL)
+    if derived is not None and rv + len(derived) >= r2:
+        rest = derived
+    if rest.endswith('нн'):
+        rest = rest[:-1]
+    else:
+        superlative = _strip(rest, SUPERLATIVE)
+        if superlative is not None:
+            rest = superlative[:-1] if superlative.endswith(
+                'нн') else superlative
+        elif rest.endswith('ь'):
+            rest = rest[:-1]
+    return head + rest
+
+
+def _english(word):
+    if word.endswith("'s"):
+        word = word[:-2]
+    for suffix, replacement in ENGLISH:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+@lru_cache(maxsize=100000)
+def _stem(word):
+    if CYRILLIC_RE.search(word.replace('ё', 'е')):
+        return _russian(word)
+    if word.isascii() and word.isalpha():
+        return _english(word)
+    return word
+
+
+def stem(word):
+    # texts repeat a small vocabulary, so most words are stemmed once
+    return _stem(word.lower())
+
+
+def stems(text):
+    """Stems of every word of text, in order"""
+    return [stem(word) for word in WORD_RE.findall(text)]
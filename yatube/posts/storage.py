@@ -0,0 +1,44 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Names every file after the SHA-256 of its content.
+
+    posts/photo.webp is stored as posts/ab/<rest of the hash>.webp, so the
+    same picture uploaded twice is written, and thumbnailed, only once.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # a name is picked in _save(), once the content has been hashed
+        return name
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        return os.path.join(directory, hexdigest[:2],
+                            f'{hexdigest[2:]}{extension}').replace('\\', '/')
+
+    def _save(self, name, content):
+        from . import blobs
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            blobs.claim(name)
+            # collect() may have deleted the file while the claim waited
+            if self.exists(name):
+                return name
+        # written aside and renamed, so that two concurrent uploads of
+        # the same content never see a half-written file
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.part', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
@@ -0,0 +1,14 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, preset):
+    """{% post_thumbnail post.image 'card' as im %}: ready thumbnail or the
+    original image while the thumbnail is still being generated"""
+    if not image:
+        return None
+    return thumbnails.lookup(image, preset) or image
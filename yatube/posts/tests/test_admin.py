@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.admin import EstimatedCountPaginator
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AdminChangeListTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        authors = [User.objects.create_user(username=f'author{i}')
+                   for i in range(3)]
+        for i in range(30):
+            post = Post.objects.create(text=f'Пост про котиков {i}',
+                                       author=authors[i % 3], group=group)
+            Comment.objects.create(post=post, author=authors[0],
+                                   text='Комментарий')
+        Follow.objects.create(user=authors[0], author=authors[1])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def queries(self, url, data=None):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        return response, captured.captured_queries
+
+    def test_changelists_do_not_count_whole_tables(self):
+        """Списки админки не делают COUNT(*) по всей таблице."""
+        for model in ('post', 'comment', 'follow'):
+            with self.subTest(model=model):
+                _, queries = self.queries(
+                    reverse(f'admin:posts_{model}_changelist'))
+                self.assertFalse([
+                    query for query in queries
+                    if 'COUNT(*)' in query['sql']
+                    and f'"posts_{model}"' in query['sql']])
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов не зависит от числа строк на странице."""
+        url = reverse('admin:posts_comment_changelist')
+        _, few = self.queries(url, {'author__id__exact': self.admin.pk})
+        _, many = self.queries(url)
+        self.assertEqual(len(few), len(many))
+
+    def test_post_search_uses_full_text_index(self):
+        """Поиск по постам в админке идёт через полнотекстовый индекс."""
+        response, queries = self.queries(
+            reverse('admin:posts_post_changelist'), {'q': 'котик 7'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        self.assertTrue(any('MATCH' in query['sql'] for query in queries))
+
+    @override_settings(ADMIN_COUNT_LIMIT=5)
+    def test_filtered_count_is_capped(self):
+        """Отфильтрованные строки считаются не дальше ADMIN_COUNT_LIMIT."""
+        paginator = EstimatedCountPaginator(
+            Post.objects.filter(text__contains='Пост'), 2)
+        self.assertEqual(paginator.count, 5)
+        self.assertEqual(paginator.count_label, '5+')
+
+    @override_settings(ADMIN_COUNT_LIMIT=30)
+    def test_count_under_the_limit_is_exact(self):
+        """Число строк не больше ADMIN_COUNT_LIMIT показывается точно."""
+        paginator = EstimatedCountPaginator(
+            Post.objects.filter(text__contains='Пост'), 2)
+        self.assertEqual(paginator.count_label, '30')
+
+    def test_unfiltered_count_is_estimated(self):
+        """Размер всей таблицы оценивается без полного подсчёта."""
+        Post.objects.order_by('pk').first().delete()
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertGreaterEqual(paginator.count, Post.objects.count())
+        self.assertEqual(paginator.count_label, f'~{paginator.count}')
+
+    def test_changelist_marks_estimated_total(self):
+        """Список админки помечает оценку числа строк как приблизительную."""
+        response, _ = self.queries(reverse('admin:posts_post_changelist'))
+        self.assertContains(
+            response, f'~{response.context["cl"].result_count} ')
@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+@override_settings(API_PAGE_SIZE=3)
+class ReadApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Group', slug='group',
+                                         description='test_descript')
+        for number in range(7):
+            Post.objects.create(text=f'Post {number}', author=cls.author,
+                                group=cls.group if number % 2 else None)
+        cls.post = Post.objects.latest('pk')
+        for number in range(5):
+            Comment.objects.create(text=f'Comment {number}', post=cls.post,
+                                   author=cls.reader)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def get(self, url, **params):
+        response = self.guest.get(url, params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response
+
+    def walk(self, url, **params):
+        """Every item reached by following the next links"""
+        items, data = [], self.get(url, **params).json()
+        while True:
+            items += data['results']
+            if data['next'] is None:
+                return items
+            data = self.guest.get(data['next']).json()
+
+    def test_posts_follow_cursors_newest_first(self):
+        """Курсоры обходят все посты от новых к старым без повторов"""
+        texts = [item['text'] for item in self.walk(reverse('api:posts'))]
+        self.assertEqual(texts, [f'Post {number}'
+                                 for number in reversed(range(7))])
+        data = self.get(reverse('api:posts')).json()
+        self.assertEqual(set(data['results'][0]),
+                         {'id', 'text', 'pub_date', 'author', 'group',
+                          'image'})
+        self.assertEqual(data['results'][0]['author'], 'Author')
+        self.assertIsNone(data['previous'])
+
+    def test_sparse_fieldsets(self):
+        """?fields= отдаёт только запрошенные поля"""
+        data = self.get(reverse('api:posts'), fields='id,group').json()
+        self.assertEqual(data['results'][0],
+                         {'id': self.post.pk, 'group': None})
+        self.assertEqual(len(self.walk(reverse('api:posts'), fields='text')),
+                         7)
+        response = self.get(reverse('api:posts'), fields='text,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['detail'])
+
+    def test_one_query_per_page(self):
+        """Страница ленты собирается одним запросом без моделей"""
+        with self.assertNumQueries(1):
+            self.get(reverse('api:posts'))
+
+    def test_group_and_profile_posts(self):
+        """Посты группы и автора, 404 для неизвестных"""
+        group_posts = self.walk(
+            reverse('api:group_posts', kwargs={'slug': 'group'}))
+        self.assertEqual(len(group_posts), 3)
+        self.assertTrue(all(item['group'] == 'group'
+                            for item in group_posts))
+        self.assertEqual(len(self.walk(
+            reverse('api:profile_posts', kwargs={'username': 'Author'}))), 7)
+        self.assertEqual(self.get(reverse(
+            'api:profile_posts', kwargs={'username': 'Reader'})).json(),
+            {'results': [], 'next': None, 'previous': None})
+        for url in (reverse('api:group_posts', kwargs={'slug': 'missing'}),
+                    reverse('api:post_detail', kwargs={'post_id': 999})):
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'detail': 'Not found.'})
+        groups = self.get(reverse('api:groups'), fields='slug').json()
+        self.assertEqual(groups, {'results': [{'slug': 'group'}]})
+
+    def test_post_detail_with_comments(self):
+        """Пост отдаётся с первой страницей комментариев"""
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        data = self.get(url, comment_fields='text').json()
+        self.assertEqual(data['post']['text'], 'Post 6')
+        self.assertEqual(data['comments']['results'],
+                         [{'text': 'Comment 4'}, {'text': 'Comment 3'},
+                          {'text': 'Comment 2'}])
+        rest = self.guest.get(data['comments']['next']).json()
+        self.assertEqual(rest['results'],
+                         [{'text': 'Comment 1'}, {'text': 'Comment 0'}])
+        self.assertIsNone(rest['next'])
+
+    def test_follow_feed(self):
+        """Лента подписок только для вошедших пользователей"""
+        response = self.get(reverse('api:follow'))
+        self.assertEqual(response.status_code, 401)
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertEqual(reader.get(reverse('api:follow')).json()['results'],
+                         [])
+        Follow.objects.create(user=self.reader, author=self.author)
+        data = reader.get(reverse('api:follow'), {'fields': 'text'}).json()
+        self.assertEqual(data['results'][0], {'text': 'Post 6'})
+        items, data = [], reader.get(reverse('api:follow'),
+                                     {'fields': 'text', 'limit': 3}).json()
+        while data['next'] is not None:
+            items += data['results']
+            data = reader.get(data['next']).json()
+        items += data['results']
+        self.assertEqual(items, [{'text': f'Post {number}'}
+                                 for number in range(6, -1, -1)])
+
+    def test_read_only(self):
+        """Запись через API чтения запрещена"""
+        response = self.guest.post(reverse('api:posts'), {'text': 'New'})
+        self.assertEqual(response.status_code, 405)
+        self.assertFalse(Post.objects.filter(text='New').exists())
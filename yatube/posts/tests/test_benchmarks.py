@@ -0,0 +1,40 @@
+from django.core.cache import cache
+from django.test import TestCase
+from posts import benchmarks
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_run_measures_every_view(self):
+        """Бенчмарк измеряет все представления на сгенерированных данных"""
+        benchmarks.seed(users=20, groups=2, posts=50, comments=100,
+                        follows=3)
+        results = benchmarks.run(repeat=2)
+        self.assertEqual(
+            set(results),
+            {'index', 'group_list', 'profile', 'post_detail',
+             'follow_index', 'add_comment', 'post_create'})
+        for name, metrics in results.items():
+            with self.subTest(name=name):
+                self.assertGreater(metrics['queries'], 0)
+                self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+
+    def test_compare_reports_extra_queries(self):
+        """Рост числа запросов считается регрессией, задержки - по флагу"""
+        baseline = {'index': {'queries': 4, 'p50_ms': 10.0}}
+        slower = {'index': {'queries': 4, 'p50_ms': 30.0}}
+        self.assertEqual(benchmarks.compare(slower, baseline), [])
+        self.assertEqual(
+            len(benchmarks.compare(slower, baseline, check_latency=True)), 1)
+        more_queries = {'index': {'queries': 14, 'p50_ms': 10.0}}
+        self.assertEqual(len(benchmarks.compare(more_queries, baseline)), 1)
+
+    def test_render_compares_template_modes(self):
+        """Время рендера главной измеряется в обоих режимах шаблонов"""
+        benchmarks.seed(users=5, groups=1, posts=15, comments=0, follows=0)
+        results = benchmarks.render(repeat=3)
+        self.assertEqual(set(results), {'debug_ms', 'cached_ms'})
+        for value in results.values():
+            self.assertGreater(value, 0)
@@ -0,0 +1,115 @@
+import datetime
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from posts import blobs
+from posts.models import MediaBlob, Post, User
+from posts.storage import ContentAddressedStorage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def upload(name='image.gif', content=GIF):
+    return SimpleUploadedFile(name, content, 'image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковое содержимое хранится в одном файле."""
+        storage = ContentAddressedStorage()
+        first = storage.save('posts/one.gif', ContentFile(GIF))
+        second = storage.save('posts/two.GIF', ContentFile(GIF))
+        other = storage.save('posts/one.gif', ContentFile(GIF + b'!'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^posts/[0-9a-f]{2}/[0-9a-f]{62}\.gif$')
+        self.assertEqual(storage.open(first).read(), GIF)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaBlobTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        # no thumbnail threads racing the table flushes of this test case
+        patcher = mock.patch('posts.thumbnails.schedule')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create(self, image):
+        return Post.objects.create(text='Пост', author=self.author,
+                                   image=image)
+
+    def test_shared_file_outlives_one_post(self):
+        """Файл удаляется вместе с последним использующим его постом."""
+        first = self.create(upload())
+        second = self.create(upload('copy.gif'))
+        name = first.image.name
+        self.assertEqual(name, second.image.name)
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 2)
+        storage = first.image.storage
+        first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 1)
+        self.assertTrue(storage.exists(name))
+        second.delete()
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(storage.exists(name))
+
+    def test_replaced_image_is_collected(self):
+        """Замена картинки при редактировании удаляет старый файл."""
+        post = self.create(upload())
+        old_name = post.image.name
+        post.image = upload('new.gif', GIF + b'new')
+        post.save()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(post.image.storage.exists(old_name))
+        self.assertEqual(MediaBlob.objects.get(name=post.image.name).refs, 1)
+
+    def test_reconcile_recounts_references(self):
+        """reconcile() пересчитывает ссылки по постам."""
+        post = self.create(upload())
+        MediaBlob.objects.filter(name=post.image.name).update(refs=5)
+        self.assertEqual(blobs.reconcile(), 1)
+        self.assertEqual(MediaBlob.objects.get(name=post.image.name).refs, 1)
+
+    def test_reused_file_is_not_collected(self):
+        """Файл, который переиспользует загрузка, не удаляется сборкой."""
+        post = self.create(upload())
+        name = post.image.name
+        storage = post.image.storage
+        # the last post is gone, its collect() has not run yet
+        MediaBlob.objects.filter(name=name).update(refs=0)
+        self.assertEqual(storage.save('posts/again.gif', ContentFile(GIF)),
+                         name)
+        self.assertEqual(blobs.collect(name), 0)
+        self.assertTrue(storage.exists(name))
+        MediaBlob.objects.filter(name=name).update(
+            claimed=timezone.now() - datetime.timedelta(
+                seconds=blobs.CLAIM_SECONDS + 1))
+        self.assertEqual(blobs.collect(name), 1)
+        self.assertFalse(storage.exists(name))
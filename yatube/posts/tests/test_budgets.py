@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import QueryBudgetExceeded
+from posts import benchmarks
+
+
+@override_settings(PROFILING_ENABLED=True)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        benchmarks.seed(users=20, groups=2, posts=60, comments=100,
+                        follows=3)
+
+    def setUp(self):
+        cache.clear()
+        self.reader, views = benchmarks.scenarios()
+        self.pages = [(url, logged_in) for name, method, url, data, logged_in
+                      in views if method == 'get']
+        self.pages.append((reverse('posts:search') + '?q=кофе', False))
+        self.guest, self.member = Client(), Client()
+        self.member.force_login(self.reader)
+
+    def get(self, url, logged_in):
+        return (self.member if logged_in else self.guest).get(url)
+
+    def test_views_stay_within_budgets(self):
+        """Страницы с холодным кэшем укладываются в бюджет запросов."""
+        # the first visit seeds the counters of a page; the budgets do not
+        # cover it, so it goes through clients without the profiler
+        with self.settings(PROFILING_ENABLED=False):
+            guest, member = Client(), Client()
+            member.force_login(self.reader)
+            for url, logged_in in self.pages:
+                (member if logged_in else guest).get(url)
+        for url, logged_in in self.pages:
+            cache.clear()
+            with self.subTest(url=url):
+                response = self.get(url, logged_in)
+                self.assertEqual(response.status_code, 200)
+
+    def test_exceeded_budget_fails(self):
+        """Превышение бюджета роняет запрос в строгом режиме."""
+        url = reverse('posts:index')
+        with self.settings(QUERY_BUDGETS={'posts:index': 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.guest.get(url)
+        cache.clear()
+        with self.settings(QUERY_BUDGETS={'posts:index': 0},
+                           QUERY_BUDGETS_STRICT=False):
+            with self.assertLogs('yatube.profiling', 'WARNING'):
+                self.assertEqual(self.guest.get(url).status_code, 200)
@@ -0,0 +1,143 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import caching
+from posts.models import Comment, Group, Post
+
+
+User = get_user_model()
+
+
+class FragmentInvalidationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(title='First_group',
+                                         description='test_descript',
+                                         slug='first_slug')
+        cls.post = Post.objects.create(text='First post', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_bump_touches_only_given_scopes(self):
+        """bump меняет версию только указанных областей"""
+        index = caching.version(caching.INDEX_SCOPE)
+        author = caching.version(caching.author_scope(self.author.pk))
+        caching.bump(caching.post_scope(self.post.pk))
+        self.assertEqual(caching.version(caching.INDEX_SCOPE), index)
+        self.assertEqual(
+            caching.version(caching.author_scope(self.author.pk)), author)
+
+    def test_new_post_shows_up_on_cached_lists(self):
+        """Новый пост сразу виден на закэшированных страницах"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'first_slug'}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+        )
+        for url in urls:
+            self.client.get(url)
+        Post.objects.create(text='Second post', author=self.author,
+                            group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Second post')
+
+    def test_edit_moves_post_between_group_pages(self):
+        """Смена группы обновляет кэш старой и новой группы"""
+        other = Group.objects.create(title='Second_group',
+                                     description='test_descript',
+                                     slug='second_slug')
+        old_url = reverse('posts:group_list', kwargs={'slug': 'first_slug'})
+        new_url = reverse('posts:group_list', kwargs={'slug': 'second_slug'})
+        self.client.get(old_url)
+        self.client.get(new_url)
+        self.post.group = other
+        self.post.save()
+        self.assertNotContains(self.client.get(old_url), 'First post')
+        self.assertContains(self.client.get(new_url), 'First post')
+
+    def test_comment_and_group_changes_invalidate(self):
+        """Комментарий и правка группы сбрасывают свои фрагменты"""
+        detail_url = reverse('posts:post_detail',
+                             kwargs={'post_id': self.post.pk})
+        self.client.get(detail_url)
+        self.client.get(reverse('posts:index'))
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Fresh comment')
+        self.assertContains(self.client.get(detail_url), 'Fresh comment')
+        self.group.slug = 'renamed_slug'
+        self.group.save()
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            'renamed_slug')
+
+
+class GuestPageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(text='First post', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.member = Client()
+        self.member.force_login(self.author)
+        self.detail = reverse('posts:post_detail',
+                              kwargs={'post_id': self.post.pk})
+
+    def test_repeated_page_skips_the_database(self):
+        """Повторный запрос гостя отдаётся из кэша без запросов к базе"""
+        first = self.guest.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            second = self.guest.get(reverse('posts:index'))
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertTrue(second.has_header('Last-Modified'))
+
+    def test_conditional_get(self):
+        """Совпавший ETag даёт 304, новый комментарий его меняет"""
+        etag = self.guest.get(self.detail)['ETag']
+        response = self.guest.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(text='Fresh comment', post=self.post,
+                               author=self.author)
+        response = self.guest.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'Fresh comment')
+
+    def test_only_the_etag_decides(self):
+        """Без If-None-Match дата If-Modified-Since не даёт 304"""
+        last_modified = self.guest.get(self.detail)['Last-Modified']
+        response = self.guest.get(self.detail,
+                                  HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_parameters_share_the_page(self):
+        """Посторонние параметры запроса не плодят копии страницы"""
+        url = reverse('posts:index')
+        etag = self.guest.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest.get(url, {'utm_source': 'mail'})
+        self.assertEqual(response['ETag'], etag)
+        self.assertNotEqual(self.guest.get(url, {'page': 2})['ETag'], etag)
+
+    def test_members_bypass_the_cache(self):
+        """Авторизованный пользователь всегда получает свежий рендер"""
+        self.guest.get(self.detail)
+        response = self.member.get(self.detail)
+        self.assertIn('form', response.context)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_missing_pages_are_not_cached(self):
+        """Несуществующая страница остаётся 404"""
+        response = self.guest.get(
+            reverse('posts:profile', kwargs={'username': 'nobody'}))
+        self.assertEqual(response.status_code, 404)
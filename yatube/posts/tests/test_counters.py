@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import counters
+from posts.models import Group, Post, PostCount
+
+
+User = get_user_model()
+
+
+class PostCountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(title='First_group',
+                                         description='test_descript',
+                                         slug='first_slug')
+        cls.other_group = Group.objects.create(title='Second_group',
+                                               description='test_descript',
+                                               slug='second_slug')
+        Post.objects.bulk_create(
+            Post(text=f'Post_{num}', author=cls.author, group=cls.group)
+            for num in range(3)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def stored(self, scope):
+        return PostCount.objects.get(scope=scope).count
+
+    def test_first_read_seeds_counter(self):
+        """Первое чтение заполняет счётчик настоящим COUNT(*)"""
+        scope = counters.group_scope(self.group.pk)
+        self.assertEqual(
+            counters.post_count(scope, self.group.posts.all()), 3)
+        self.assertEqual(self.stored(scope), 3)
+
+    def test_signals_keep_counters_in_sync(self):
+        """Создание, перенос в другую группу и удаление меняют счётчики"""
+        group_scope = counters.group_scope(self.group.pk)
+        other_scope = counters.group_scope(self.other_group.pk)
+        for scope, queryset in ((counters.GLOBAL_SCOPE, Post.objects.all()),
+                                (group_scope, self.group.posts.all()),
+                                (other_scope, self.other_group.posts.all())):
+            counters.post_count(scope, queryset)
+        post = Post.objects.create(text='New', author=self.author,
+                                   group=self.group)
+        self.assertEqual(self.stored(counters.GLOBAL_SCOPE), 4)
+        self.assertEqual(self.stored(group_scope), 4)
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(self.stored(group_scope), 3)
+        self.assertEqual(self.stored(other_scope), 1)
+        post.delete()
+        self.assertEqual(self.stored(counters.GLOBAL_SCOPE), 3)
+        self.assertEqual(self.stored(other_scope), 0)
+
+    def test_index_does_not_count_rows_twice(self):
+        """Главная страница не считает посты, когда счётчик уже есть"""
+        client = Client()
+        client.get(reverse('posts:index'))
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries.captured_queries)
+        )
@@ -0,0 +1,32 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from posts import benchmarks, explain
+
+
+class ExplainTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_detects_scans_and_sorts(self):
+        """Полный проход по таблице и временная сортировка находятся."""
+        self.assertEqual(
+            explain.problems("SELECT id FROM posts_post WHERE text = 'a'"),
+            ['SCAN posts_post'])
+        self.assertTrue(explain.problems(
+            'SELECT id FROM posts_post WHERE group_id = 1 ORDER BY text'))
+        self.assertEqual(explain.problems(
+            'SELECT id FROM posts_post WHERE group_id = 1 '
+            'ORDER BY pub_date DESC, id DESC LIMIT 10'), [])
+        self.assertEqual(explain.problems(
+            'SELECT id FROM posts_comment WHERE post_id = 1 '
+            'ORDER BY created DESC LIMIT 10'), [])
+
+    def test_views_use_indexes(self):
+        """Запросы всех страниц идут по индексам, без полных проходов."""
+        benchmarks.seed(users=20, groups=2, posts=60, comments=100,
+                        follows=3)
+        report = explain.check_views()
+        self.assertEqual(report, {}, '\n\n'.join(
+            f'{view}: {found}\n{sql}'
+            for view, items in report.items() for sql, found in items))
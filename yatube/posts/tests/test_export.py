@@ -0,0 +1,137 @@
+import csv
+import datetime as dt
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from posts import export
+from posts.models import Comment, Follow, Post
+
+
+User = get_user_model()
+
+
+def lines(content):
+    return [json.loads(line) for line in content.decode().splitlines()]
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.staff = User.objects.create_user(username='Staff', is_staff=True)
+        cls.posts = [Post.objects.create(text=f'Пост {number}',
+                                         author=cls.author)
+                     for number in range(5)]
+        old = timezone.now() - dt.timedelta(days=30)
+        Post.objects.filter(pk__in=[post.pk for post in cls.posts[:2]]
+                            ).update(pub_date=old)
+        Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                               text='Хм, "да", нет')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def content(self, table, **options):
+        return b''.join(export.stream(table, **options))
+
+    def test_ndjson_rows_in_id_order(self):
+        """NDJSON: одна строка на запись, по возрастанию id"""
+        rows = lines(self.content('posts'))
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts])
+        self.assertEqual(rows[0]['text'], 'Пост 0')
+        self.assertEqual(rows[0]['author_id'], self.author.pk)
+        self.assertEqual(lines(self.content('follows')), [{
+            'id': Follow.objects.get().pk, 'user_id': self.reader.pk,
+            'author_id': self.author.pk}])
+
+    def test_csv_with_header(self):
+        """CSV начинается с заголовка и экранирует текст"""
+        rows = list(csv.reader(io.StringIO(
+            self.content('comments', fmt='csv').decode())))
+        self.assertEqual(rows[0], list(export.TABLES['comments'][1]))
+        self.assertEqual(rows[1][3], 'Хм, "да", нет')
+        self.assertEqual(len(rows), 2)
+
+    def test_gzip(self):
+        """Сжатый вывод распаковывается в тот же файл"""
+        self.assertEqual(
+            gzip.decompress(self.content('posts', compress=True)),
+            self.content('posts'))
+
+    def test_watermarks(self):
+        """since_id и since отдают только новые записи"""
+        rows = lines(self.content('posts', since_id=self.posts[2].pk))
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts[3:]])
+        since = export.parse_since(
+            (timezone.now() - dt.timedelta(days=1)).date().isoformat())
+        rows = lines(self.content('posts', since=since))
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts[2:]])
+        with self.assertRaises(export.ExportError):
+            export.stream('follows', since=since)
+        with self.assertRaises(export.ExportError):
+            export.parse_since('yesterday')
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_rows_are_fetched_in_chunks(self):
+        """Выгрузка не зависит от размера порции"""
+        self.assertEqual(len(lines(self.content('posts'))), 5)
+
+    def test_endpoint_streams_to_staff(self):
+        """Выгрузка по API доступна только персоналу и идёт потоком"""
+        url = reverse('api:export', kwargs={'table': 'posts'})
+        self.assertEqual(Client().get(url).status_code, 401)
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertEqual(reader.get(url).status_code, 403)
+        response = self.staff_client.get(
+            url, {'format': 'csv', 'gzip': '1',
+                  'since_id': self.posts[0].pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('posts.csv.gz', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(gzip.decompress(
+            b''.join(response.streaming_content)).decode())))
+        self.assertEqual(len(rows), 5)
+
+    def test_endpoint_errors(self):
+        """Неизвестные таблицы и параметры дают ошибки в JSON"""
+        url = reverse('api:export', kwargs={'table': 'posts'})
+        for query in ({'format': 'xml'}, {'since_id': 'x'},
+                      {'since': 'soon'}):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.staff_client.get(url, query).status_code, 400)
+        response = self.staff_client.get(
+            reverse('api:export', kwargs={'table': 'users'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_command(self):
+        """Команда export пишет файл"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.ndjson')
+            call_command('export', 'posts', '--output', path,
+                         '--since-id', str(self.posts[3].pk))
+            with open(path, 'rb') as target:
+                self.assertEqual([row['id'] for row in lines(target.read())],
+                                 [self.posts[4].pk])
+        with self.assertRaises(CommandError):
+            call_command('export', 'follows', '--since', '2020-01-01')
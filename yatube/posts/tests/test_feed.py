@@ -0,0 +1,169 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import caching, feed
+from posts.models import FeedEntry, Follow, Post, PulledAuthor
+
+
+User = get_user_model()
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.other_reader = User.objects.create_user(username='OtherReader')
+        Post.objects.create(text='Old post', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed_texts(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка переносит старые посты в ленту, отписка их убирает"""
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'Author'}))
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(),
+                         1)
+        self.assertEqual(self.feed_texts(), ['Old post'])
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'Author'}))
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_texts(), [])
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text='New post', author=self.author)
+        self.assertEqual(self.feed_texts(), ['New post', 'Old post'])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_popular_author_is_pulled_at_read_time(self):
+        """Посты автора с множеством подписчиков читаются при запросе"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other_reader, author=self.author)
+        Post.objects.create(text='New post', author=self.author)
+        self.assertTrue(
+            PulledAuthor.objects.filter(author=self.author).exists())
+        self.assertFalse(
+            FeedEntry.objects.filter(post__text='New post').exists())
+        self.assertEqual(self.feed_texts(), ['New post', 'Old post'])
+
+    def test_pushed_and_pulled_posts_are_merged(self):
+        """Лента объединяет разосланные и читаемые при запросе посты"""
+        pushed_author = User.objects.create_user(username='Pushed')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=pushed_author)
+        PulledAuthor.objects.create(author=self.author)
+        Post.objects.create(text='Pushed post', author=pushed_author)
+        Post.objects.create(text='Pulled post', author=self.author)
+        self.assertEqual(self.feed_texts(),
+                         ['Pulled post', 'Pushed post', 'Old post'])
+
+    def test_merged_feed_pages_in_order(self):
+        """Объединённая лента листается по порядку без повторов"""
+        pushed_author = User.objects.create_user(username='Pushed')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=pushed_author)
+        PulledAuthor.objects.create(author=self.author)
+        for number in range(5):
+            Post.objects.create(text=f'Pushed {number}', author=pushed_author)
+            Post.objects.create(text=f'Pulled {number}', author=self.author)
+        expected = list(Post.objects.filter(
+            author__in=[self.author, pushed_author]).order_by(
+                '-pub_date', '-pk').values_list('text', flat=True))
+        posts = feed.feed_posts(self.reader)
+        self.assertEqual(posts.count(), 11)
+        self.assertEqual([post.text for post in posts[3:7]], expected[3:7])
+        texts, url = [], reverse('posts:follow_index')
+        with self.settings(PAGE_ON_SIZE=4, PAGINATION_MODE='cursor'):
+            while url:
+                page = self.reader_client.get(url).context['page_obj']
+                texts += [post.text for post in page]
+                url = (f"{reverse('posts:follow_index')}?cursor="
+                       f'{page.next_cursor}' if page.has_next() else None)
+        self.assertEqual(texts, expected)
+
+    @override_settings(FEED_FANOUT_LIMIT=2)
+    def test_rebuild_demotes_authors_who_lost_followers(self):
+        """Полная пересборка снова рассылает посты автора без подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        PulledAuthor.objects.create(author=self.author)
+        self.assertEqual(feed.rebuild(), 1)
+        self.assertFalse(PulledAuthor.objects.exists())
+        self.assertEqual(
+            list(FeedEntry.objects.values_list('post__text', flat=True)),
+            ['Old post'])
+        self.assertEqual(self.feed_texts(), ['Old post'])
+
+
+class FollowFeedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.other_author = User.objects.create_user(username='OtherAuthor')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.other_reader = User.objects.create_user(username='OtherReader')
+        Post.objects.create(text='Author post', author=cls.author)
+        Post.objects.create(text='Other author post', author=cls.other_author)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.other_reader, author=cls.other_author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.other_reader_client = Client()
+        self.other_reader_client.force_login(self.other_reader)
+
+    def test_feed_fragments_are_per_user(self):
+        """Кэш ленты не делится между пользователями"""
+        url = reverse('posts:follow_index')
+        self.assertContains(self.reader_client.get(url), 'Author post')
+        response = self.other_reader_client.get(url)
+        self.assertContains(response, 'Other author post')
+        self.assertNotContains(response, '>Author post')
+
+    def test_cached_feed_is_invalidated(self):
+        """Новый пост, отписка и подписка сбрасывают кэш ленты"""
+        url = reverse('posts:follow_index')
+        self.reader_client.get(url)
+        Post.objects.create(text='Fresh post', author=self.author)
+        self.assertContains(self.reader_client.get(url), 'Fresh post')
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertNotContains(self.reader_client.get(url), 'Fresh post')
+        Follow.objects.create(user=self.reader, author=self.other_author)
+        self.assertContains(self.reader_client.get(url), 'Other author post')
+
+    def test_pulled_author_post_does_not_touch_follower_feeds(self):
+        """Пост автора с вытягиваемой лентой не сбрасывает ленты по одной"""
+        PulledAuthor.objects.create(author=self.author)
+        url = reverse('posts:follow_index')
+        self.reader_client.get(url)
+        feed_version = caching.version(caching.feed_scope(self.reader.pk))
+        Post.objects.create(text='Fresh post', author=self.author)
+        self.assertEqual(
+            caching.version(caching.feed_scope(self.reader.pk)),
+            feed_version)
+        self.assertContains(self.reader_client.get(url), 'Fresh post')
+
+    def test_feed_total_follows_new_posts(self):
+        """Число постов в ленте обновляется вместе с её кэшем"""
+        PulledAuthor.objects.create(author=self.other_author)
+        Follow.objects.create(user=self.reader, author=self.other_author)
+        url = reverse('posts:follow_index')
+        page = self.reader_client.get(url).context['page_obj']
+        self.assertEqual(page.paginator.count, 2)
+        Post.objects.create(text='Pushed post', author=self.author)
+        Post.objects.create(text='Pulled post', author=self.other_author)
+        page = self.reader_client.get(url).context['page_obj']
+        self.assertEqual(page.paginator.count, 4)
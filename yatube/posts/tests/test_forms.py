@@ -1,4 +1,13 @@
-from django.test import Client, TestCase
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from PIL import Image
+from posts import images
 from posts.models import Post, Group
 
 from django.contrib.auth import get_user_model
@@ -6,6 +15,9 @@ from django.urls import reverse
 from django.core.cache import cache
 
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
 User = get_user_model()
 
 
@@ -73,3 +85,81 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(Post.objects.count(), 1)
         self.assertEqual(post.text, 'Test text (edited)')
         self.assertEqual(post.pub_date, initial_pub_date)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, size=(100, 50), exif=None, name='photo.jpg'):
+        buffer = BytesIO()
+        extra = {'exif': exif} if exif else {}
+        Image.new('RGB', size, 'red').save(buffer, 'JPEG', **extra)
+        return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+    def create(self, image):
+        return self.client.post(reverse('posts:post_create'),
+                                data={'text': 'С картинкой', 'image': image})
+
+    def test_upload_is_reencoded_without_metadata(self):
+        """Загрузка пересохраняется без EXIF и с метаданными в модели."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Secret camera'
+        self.create(self.upload(exif=exif.tobytes()))
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.startswith('posts/'))
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,'))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, images._format())
+            self.assertFalse(stored.getexif())
+
+    @override_settings(IMAGE_MAX_SIDE=64)
+    def test_large_image_is_downscaled(self):
+        """Большая картинка уменьшается до IMAGE_MAX_SIDE."""
+        self.create(self.upload(size=(256, 128)))
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (64, 32))
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_too_large_file_is_rejected(self):
+        """Слишком большой файл не принимается формой."""
+        response = self.create(self.upload())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_too_many_pixels_are_rejected(self):
+        """Картинка с огромным разрешением отклоняется до декодирования."""
+        response = self.create(self.upload(size=(100, 50)))
+        self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.exists())
+
+    def test_truncated_image_is_rejected(self):
+        """Обрезанный файл отклоняется формой, а не роняет сервер."""
+        data = self.upload(size=(200, 100)).read()
+        truncated = SimpleUploadedFile('photo.jpg', data[:-10],
+                                       'image/jpeg')
+        with self.assertRaises(ValidationError) as raised:
+            images.normalize(truncated)
+        self.assertEqual(raised.exception.code, 'invalid_image')
+        truncated.seek(0)
+        response = self.create(truncated)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.exists())
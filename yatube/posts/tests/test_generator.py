@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import Count, F
+from django.test import TestCase
+
+from posts.generator import Generator, GeneratorError, generate
+from posts.models import AuthorStats, Comment, FeedEntry, Follow, Group, Post
+
+User = get_user_model()
+
+
+class GeneratorTests(TestCase):
+    def test_generates_requested_volumes(self):
+        """Генератор создаёт заданное число записей и ленты подписчиков."""
+        generate(users=30, groups=3, posts=200, comments=300, follows=5,
+                 batch_size=64)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        expected = Post.objects.filter(
+            author__following__isnull=False).count()
+        self.assertEqual(FeedEntry.objects.count(), expected)
+        self.assertFalse(AuthorStats.objects.exists())
+
+    def test_same_seed_same_data(self):
+        """Один и тот же seed даёт одинаковые данные."""
+        options = dict(users=20, groups=2, posts=50, comments=50, follows=3,
+                       batch_size=16)
+        generate(seed=7, prefix='one', **options)
+        first = list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date__date', 'author__username'))
+        generate(seed=7, prefix='two', **options)
+        second = list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date__date', 'author__username'))[len(first):]
+        self.assertEqual([row[:2] for row in first],
+                         [row[:2] for row in second])
+        self.assertEqual(
+            [row[2].split('_')[1] for row in first],
+            [row[2].split('_')[1] for row in second])
+
+    def test_power_law_concentrates_authorship(self):
+        """Немногие авторы пишут большую часть постов."""
+        Generator(users=50, groups=1, posts=500, comments=0, follows=0,
+                  alpha=1.2).run()
+        top = Post.objects.values('author').annotate(
+            n=Count('pk')).order_by('-n').values_list('n', flat=True)[:5]
+        self.assertGreater(sum(top), 250)
+
+    def test_pub_dates_grow_with_rows(self):
+        """Даты публикаций растут вместе с номером поста."""
+        generate(users=5, groups=1, posts=40, comments=0, follows=0,
+                 batch_size=8)
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True))
+        self.assertEqual(dates, sorted(dates))
+
+    def test_comments_follow_generated_posts(self):
+        """Комментарии пишутся к сгенерированным постам и не раньше них."""
+        author = User.objects.create_user(username='Author')
+        own = Post.objects.create(text='Свой пост', author=author)
+        generate(users=10, groups=1, posts=30, comments=100, follows=0,
+                 batch_size=16)
+        self.assertFalse(own.comments.exists())
+        self.assertFalse(Comment.objects.filter(
+            created__lt=F('post__pub_date')).exists())
+        # the field still dates new posts itself
+        later = Post.objects.create(text='Новый пост', author=author)
+        self.assertGreater(later.pub_date, own.pub_date)
+
+    def test_refresh_keeps_other_data(self):
+        """Пересчёт после генерации не трогает остальные данные сайта."""
+        author = User.objects.create_user(username='Author')
+        reader = User.objects.create_user(username='Reader')
+        Follow.objects.create(user=reader, author=author)
+        Post.objects.create(text='Свой пост', author=author)
+        AuthorStats.objects.get_or_create(author=author)
+        generate(users=10, groups=1, posts=30, comments=0, follows=3,
+                 batch_size=16)
+        self.assertTrue(AuthorStats.objects.filter(author=author).exists())
+        self.assertEqual(FeedEntry.objects.filter(user=reader).count(), 1)
+
+    def test_taken_prefix_is_refused(self):
+        """Повторный запуск с тем же префиксом не дублирует данные."""
+        options = dict(users=5, groups=1, posts=10, comments=0, follows=0)
+        generate(**options)
+        with self.assertRaises(GeneratorError):
+            generate(**options)
+        with self.assertRaises(CommandError):
+            call_command('generate_data', workers=1, stdout=StringIO(),
+                         **options)
+        self.assertEqual(Post.objects.count(), 10)
@@ -0,0 +1,179 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import caching, counters, ingest, search, stats
+from posts.models import (AuthorStats, Comment, FeedEntry, Follow, Group,
+                          Post, PostCount)
+
+
+User = get_user_model()
+
+
+def ndjson(*records):
+    return [json.dumps(record, ensure_ascii=False) for record in records]
+
+
+class IngestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.other = User.objects.create_user(username='Other')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Котики', slug='cats',
+                                         description='test_descript')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(text='Old post', author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+
+    def posts(self, count, **extra):
+        return ndjson(*({'type': 'post', 'text': f'Imported {number}',
+                         **extra} for number in range(count)))
+
+    def test_batch_keeps_derived_data_in_sync(self):
+        """Импорт обновляет счётчики, статистику, ленты, поиск и кэш"""
+        group_scope = counters.group_scope(self.group.pk)
+        counters.post_count(counters.GLOBAL_SCOPE, Post.objects.all())
+        counters.post_count(group_scope, self.group.posts.all())
+        stats.for_author(self.author)
+        version = caching.version(caching.INDEX_SCOPE)
+        report = ingest.ingest(
+            self.posts(3, group='cats') + self.posts(2) + ndjson(
+                {'type': 'comment', 'post': self.post.pk, 'text': 'Nice'}),
+            author=self.author)
+        self.assertEqual(report.as_dict(), {
+            'created': {'posts': 5, 'comments': 1}, 'errors': []})
+        self.assertEqual(
+            PostCount.objects.get(scope=counters.GLOBAL_SCOPE).count, 6)
+        self.assertEqual(PostCount.objects.get(scope=group_scope).count, 3)
+        author_stats = AuthorStats.objects.get(author=self.author)
+        self.assertEqual(author_stats.posts_count, 5)
+        self.assertEqual(author_stats.comments_count, 1)
+        self.assertEqual(stats.reconcile(dry_run=True), 0)
+        imported = set(Post.objects.filter(
+            text__startswith='Imported').values_list('pk', flat=True))
+        self.assertEqual(set(FeedEntry.objects.filter(
+            user=self.reader).values_list('post_id', flat=True)), imported)
+        self.assertNotEqual(caching.version(caching.INDEX_SCOPE), version)
+        self.assertEqual(Comment.objects.get(text='Nice').author,
+                         self.author)
+        if search.available():
+            found = search.SearchResults('котики')
+            self.assertEqual(found.count(), 3)
+            self.assertTrue(all(post.pk in imported for post in found[:3]))
+
+    def test_keys_survive_other_writers(self):
+        """Ключи пакета верны, даже если другие пишут одновременно"""
+        bulk_create = Post.objects.bulk_create
+
+        def interleaved(objs, **kwargs):
+            Post.objects.create(text='Before', author=self.other)
+            created = bulk_create(objs, **kwargs)
+            Post.objects.create(text='After', author=self.other)
+            return created
+
+        with mock.patch.object(Post.objects, 'bulk_create', interleaved):
+            ingest.ingest(self.posts(3), author=self.author)
+        self.assertEqual(
+            sorted(FeedEntry.objects.filter(user=self.reader).values_list(
+                'post__text', flat=True)),
+            ['Imported 0', 'Imported 1', 'Imported 2'])
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        """Число запросов на пакет не зависит от числа записей"""
+        def queries(count):
+            with CaptureQueriesContext(connection) as captured:
+                ingest.ingest(self.posts(count, group='cats'),
+                              author=self.author)
+            return len(captured.captured_queries)
+        self.assertEqual(queries(3), queries(30))
+
+    def test_rejected_lines_are_reported(self):
+        """Ошибочные строки описываются, остальные импортируются"""
+        lines = ['{broken', '[1]'] + ndjson(
+            {'type': 'like'},
+            {'type': 'post', 'text': ''},
+            {'type': 'post', 'text': 'Text', 'group': 'missing'},
+            {'type': 'comment', 'post': 999, 'text': 'Text'},
+            {'type': 'post', 'text': 'Text', 'author': 'Other'},
+            {'type': 'post', 'text': 'Valid'},
+        )
+        report = ingest.ingest(lines, author=self.author)
+        errors = {error['line']: error['errors'] for error in report.errors}
+        self.assertEqual(sorted(errors), [1, 2, 3, 4, 5, 6, 7])
+        self.assertIn('text', errors[4])
+        self.assertIn('group', errors[5])
+        self.assertIn('post', errors[6])
+        self.assertIn('author', errors[7])
+        self.assertEqual(report.as_dict()['created'],
+                         {'posts': 1, 'comments': 0})
+        self.assertTrue(Post.objects.filter(text='Valid').exists())
+
+    def test_trusted_import_names_authors(self):
+        """Доверенный импорт указывает автора каждой записи"""
+        report = ingest.ingest(ndjson(
+            {'type': 'post', 'text': 'By other', 'author': 'Other'},
+            {'type': 'post', 'text': 'By nobody', 'author': 'Nobody'},
+            {'type': 'post', 'text': 'Without author'},
+        ), trusted=True)
+        self.assertEqual(Post.objects.get(text='By other').author,
+                         self.other)
+        self.assertEqual([error['line'] for error in report.errors], [2, 3])
+
+    def test_batch_endpoint(self):
+        """Пакетный эндпоинт принимает NDJSON от вошедших пользователей"""
+        url = reverse('api:batch')
+        body = '\n'.join(self.posts(2))
+        response = Client().post(url, body,
+                                 content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 401)
+        client = Client()
+        client.force_login(self.author)
+        self.assertEqual(client.get(url).status_code, 405)
+        response = client.post(url, body + '\n{broken',
+                               content_type='application/x-ndjson')
+        self.assertEqual(response.json(), {
+            'created': {'posts': 2, 'comments': 0},
+            'errors': [{'line': 3, 'errors': {'__all__': ['Invalid JSON.']}}],
+        })
+        self.assertEqual(
+            Post.objects.filter(author=self.author).count(), 2)
+
+    def test_batch_endpoint_checks_csrf(self):
+        """Пакетный эндпоинт требует CSRF-токен, как любая форма"""
+        url = reverse('api:batch')
+        body = '\n'.join(self.posts(1))
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.author)
+        response = client.post(url, body,
+                               content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 403)
+        token = 'a' * 32
+        client.cookies['csrftoken'] = token
+        response = client.post(url, body, HTTP_X_CSRFTOKEN=token,
+                               content_type='application/x-ndjson')
+        self.assertEqual(response.json()['created']['posts'], 1)
+
+    def test_command(self):
+        """Команда ingest импортирует файл"""
+        handle, path = tempfile.mkstemp(suffix='.ndjson')
+        with os.fdopen(handle, 'w', encoding='utf-8') as source:
+            source.write('\n'.join(self.posts(4)) + '\n')
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        call_command('ingest', path, author='Author', stdout=out)
+        self.assertIn('4 posts and 0 comments imported', out.getvalue())
+        self.assertEqual(
+            Post.objects.filter(author=self.author).count(), 4)
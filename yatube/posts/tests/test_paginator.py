@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post
+from posts.paginator import CursorPage
+
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        Post.objects.bulk_create(
+            Post(text=f'Post_{num}', author=cls.author) for num in range(25)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_cursor_walks_all_posts_once(self):
+        """Курсоры next проходят по всем постам без пропусков и повторов"""
+        seen = []
+        response = self.client.get(reverse('posts:index') + '?cursor=')
+        while True:
+            page_obj = response.context['page_obj']
+            self.assertIsInstance(page_obj, CursorPage)
+            seen.extend(post.pk for post in page_obj)
+            if not page_obj.has_next():
+                break
+            response = self.client.get(
+                reverse('posts:index') + f'?cursor={page_obj.next_cursor}'
+            )
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list('pk',
+                                                                  flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор previous возвращает ту же страницу, что была до этого"""
+        first = self.client.get(reverse('posts:index') + '?cursor=')
+        first_page = first.context['page_obj']
+        self.assertFalse(first_page.has_previous())
+        second = self.client.get(
+            reverse('posts:index') + f'?cursor={first_page.next_cursor}'
+        )
+        second_page = second.context['page_obj']
+        back = self.client.get(
+            reverse('posts:index') + f'?cursor={second_page.previous_cursor}'
+        )
+        self.assertEqual([post.pk for post in back.context['page_obj']],
+                         [post.pk for post in first_page])
+        self.assertTrue(back.context['page_obj'].has_next())
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор показывает первую страницу"""
+        response = self.client.get(reverse('posts:index') + '?cursor=@@@')
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    @override_settings(PAGINATION_MODE='cursor')
+    def test_cursor_mode_from_settings(self):
+        """PAGINATION_MODE='cursor' включает курсоры без параметра"""
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'Author'})
+        )
+        self.assertIsInstance(response.context['page_obj'], CursorPage)
+        self.assertContains(response, '?cursor=')
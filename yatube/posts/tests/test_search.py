@@ -0,0 +1,115 @@
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Group, Post, User
+from posts.stemmer import stem
+
+
+class StemmerTests(TestCase):
+    def test_word_forms_share_a_stem(self):
+        """Формы одного слова сводятся к одной основе."""
+        for forms in (('книга', 'книги', 'книгами', 'книгой'),
+                      ('читала', 'читали', 'читать'),
+                      ('story', 'stories'),
+                      ('connect', 'connected', 'connecting')):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(word) for word in forms}), 1)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Путешествия', slug='travel',
+                                         description='Группа')
+        cls.books = Post.objects.create(
+            text='Читаю новые книги про море', author=cls.author)
+        cls.trip = Post.objects.create(
+            text='Фото с моря', author=cls.author, group=cls.group)
+        Post.objects.create(text='Ничего общего', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        # a test may edit or delete them; the class attributes stay intact
+        self.books = Post.objects.get(pk=self.books.pk)
+        self.group = Group.objects.get(pk=self.group.pk)
+
+    def found(self, query):
+        return list(search.SearchResults(query)[0:20])
+
+    def test_finds_other_word_forms(self):
+        """Поиск находит посты по другим формам слова."""
+        self.assertEqual(self.found('книга'), [self.books])
+        self.assertCountEqual(self.found('морем'), [self.books, self.trip])
+
+    def test_group_title_is_searched(self):
+        """Название группы тоже попадает в индекс."""
+        self.assertEqual(self.found('путешествие'), [self.trip])
+
+    def test_last_word_is_a_prefix(self):
+        """Последнее слово запроса ищется как префикс."""
+        self.assertEqual(self.found('Фот'), [self.trip])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        self.books.text = 'Теперь про кино'
+        self.books.save()
+        self.assertEqual(self.found('книги'), [])
+        self.assertEqual(self.found('кино'), [self.books])
+        self.books.delete()
+        self.assertEqual(self.found('кино'), [])
+
+    def test_renamed_group_is_reindexed(self):
+        """Переименование группы переиндексирует её посты."""
+        self.group.title = 'Горы'
+        self.group.save()
+        self.assertEqual(self.found('путешествия'), [])
+        self.assertEqual(self.found('горы'), [self.trip])
+
+    def test_better_match_first(self):
+        """Пост с большим числом совпадений идёт выше."""
+        best = Post.objects.create(text='море море море', author=self.author)
+        self.assertEqual(self.found('море')[0], best)
+
+    def test_search_page(self):
+        """Страница /search/ выдаёт найденные посты и сохраняет запрос."""
+        response = Client().get(reverse('posts:search'), {'q': 'книги'})
+        self.assertEqual(list(response.context['page_obj']), [self.books])
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        self.assertEqual(response.context['page_query'], 'q=%D0%BA%D0%BD%D0'
+                         '%B8%D0%B3%D0%B8&')
+
+    def test_empty_query(self):
+        """Пустой запрос ничего не находит."""
+        response = Client().get(reverse('posts:search'), {'q': ' !? '})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].paginator.count, 0)
+
+    @override_settings(SEARCH_MAX_HITS=2)
+    def test_best_matches_of_all_are_ranked(self):
+        """Страницы показывают лучшие совпадения, а не самые новые."""
+        Post.objects.create(
+            text='Снова про море, а ещё про горы, реки, леса и города',
+            author=self.author)
+        results = search.SearchResults('море')
+        self.assertEqual(results.count(), 2)
+        self.assertEqual(results[0:10], [self.trip, self.books])
+
+    @override_settings(SEARCH_CANDIDATES=2)
+    def test_only_newest_matches_are_ranked(self):
+        """Ранжируются только самые новые совпадения."""
+        newest = Post.objects.create(text='Море', author=self.author)
+        self.assertCountEqual(search.SearchResults('море')[0:10],
+                              [self.trip, newest])
+
+    def test_flush_empties_the_index(self):
+        """После flush старые записи индекса не находят новые посты."""
+        call_command('flush', interactive=False, verbosity=0)
+        author = User.objects.create_user(username='other')
+        Post.objects.create(pk=self.books.pk, text='Другой текст',
+                            author=author)
+        self.assertEqual(self.found('книга'), [])
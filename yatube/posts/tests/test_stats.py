@@ -0,0 +1,72 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import stats
+from posts.models import AuthorStats, Comment, Follow, Post
+
+
+User = get_user_model()
+
+
+class AuthorStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(text='Post', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def seed(self, user):
+        # class-level users may hold stats cached by a rolled back test
+        return stats.for_author(User.objects.get(pk=user.pk))
+
+    def numbers(self, user):
+        stored = AuthorStats.objects.get(author=user)
+        return [getattr(stored, field) for field in stats.FIELDS]
+
+    def test_first_read_seeds_stats(self):
+        """Первое чтение считает статистику по базе"""
+        Comment.objects.create(post=self.post, author=self.author, text='c')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.seed(self.author).posts_count, 1)
+        self.assertEqual(self.numbers(self.author), [1, 1, 1, 0])
+
+    def test_signals_update_stats(self):
+        """Посты, комментарии и подписки меняют сохранённые числа"""
+        self.seed(self.author)
+        self.seed(self.reader)
+        post = Post.objects.create(text='Second', author=self.author)
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='c')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.numbers(self.author), [2, 0, 1, 0])
+        self.assertEqual(self.numbers(self.reader), [0, 1, 0, 1])
+        follow.delete()
+        comment.delete()
+        post.delete()
+        self.assertEqual(self.numbers(self.author), [1, 0, 0, 0])
+        self.assertEqual(self.numbers(self.reader), [0, 0, 0, 0])
+
+    def test_reconcile_command_fixes_drift(self):
+        """Команда reconcile_stats исправляет расхождения"""
+        self.seed(self.author)
+        AuthorStats.objects.filter(author=self.author).update(posts_count=40)
+        out = StringIO()
+        call_command('reconcile_stats', stdout=out)
+        self.assertIn('1 users fixed', out.getvalue())
+        self.assertEqual(self.numbers(self.author), [1, 0, 0, 0])
+
+    def test_profile_reads_stored_numbers(self):
+        """Профиль показывает сохранённое число постов"""
+        self.seed(self.author)
+        AuthorStats.objects.filter(author=self.author).update(posts_count=7)
+        response = Client().get(
+            reverse('posts:profile', kwargs={'username': 'Author'}))
+        self.assertContains(response, 'Всего постов: 7')
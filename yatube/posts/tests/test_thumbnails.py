@@ -0,0 +1,91 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts import caching, thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Пост с картинкой', author=self.author,
+            image=SimpleUploadedFile('image.gif', GIF, 'image/gif'))
+
+    def render(self):
+        return Template(
+            '{% load post_images %}'
+            '{% post_thumbnail post.image "card" as im %}{{ im.url }}'
+        ).render(Context({'post': self.post}))
+
+    def test_saving_an_image_queues_it(self):
+        """Сохранение поста с картинкой ставит её в очередь."""
+        self.assertFalse(cache.add(
+            f'thumbnail-queued:{self.post.image.name}', True))
+
+    def test_missing_thumbnail_falls_back_without_resizing(self):
+        """Пока миниатюры нет, шаблон отдаёт оригинал и ничего не ресайзит."""
+        with mock.patch('sorl.thumbnail.default.engine.get_image') as engine:
+            self.assertEqual(self.render(), self.post.image.url)
+        engine.assert_not_called()
+
+    def test_ready_thumbnail_is_served(self):
+        """Миниатюра, готовая после generate(), отдаётся без ресайза."""
+        thumbnail = ImageFile('cache/ab/cd/thumbnail.gif', default.storage)
+        thumbnail.set_size((960, 339))
+        with mock.patch('posts.thumbnails.get_thumbnail',
+                        return_value=thumbnail):
+            thumbnails.generate(self.post.image.name)
+        with mock.patch('sorl.thumbnail.default.engine.get_image') as engine:
+            self.assertEqual(self.render(), thumbnail.url)
+        engine.assert_not_called()
+
+    def test_generate_renders_every_preset(self):
+        """generate() строит миниатюры всех пресетов."""
+        with mock.patch('posts.thumbnails.get_thumbnail') as get_thumbnail:
+            get_thumbnail.return_value.size = None
+            thumbnails.generate(self.post.image.name)
+        self.assertEqual(get_thumbnail.call_count,
+                         len(settings.THUMBNAIL_PRESETS))
+
+    def test_command_keeps_the_rest_of_the_cache(self):
+        """generate_thumbnails сбрасывает только страницы с картинками."""
+        cache.set('unrelated', 1)
+        images = caching.version(caching.IMAGES_SCOPE)
+        with mock.patch('posts.thumbnails.get_thumbnail') as get_thumbnail:
+            get_thumbnail.return_value.size = None
+            call_command('generate_thumbnails', stdout=io.StringIO())
+        self.assertEqual(cache.get('unrelated'), 1)
+        self.assertNotEqual(caching.version(caching.IMAGES_SCOPE), images)
@@ -4,10 +4,13 @@ import tempfile
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.urls import reverse
+from django.urls import reverse, set_script_prefix
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from posts.models import Post, Group, Comment, Follow
 from posts.forms import PostForm, CommentForm
+from posts.templatetags.post_cards import with_links
 from django import forms
 from django.conf import settings
 
@@ -248,18 +251,22 @@ class PostPagesTests(TestCase):
         """
         response = self.author_client.get(reverse('posts:index'))
         content_before = response.content
-        self.post = Post.objects.create(
+        # update() bypasses the signals, so the cached fragment stays
+        Post.objects.filter(pk=self.post.pk).update(text='Author_Changed')
+        response = self.author_client.get(reverse('posts:index'))
+        content_after = response.content
+        self.assertEqual(content_before, content_after)
+        # a new post bumps the index version and shows up at once
+        Post.objects.create(
             text='Author_First_cache',
             author=self.author,
             group=self.first_group
         )
         response = self.author_client.get(reverse('posts:index'))
-        content_after = response.content
+        self.assertContains(response, 'Author_First_cache')
         cache.clear()
         response = self.author_client.get(reverse('posts:index'))
-        content_clean_cache = response.content
-        self.assertEqual(content_before, content_after)
-        self.assertNotEqual(content_before, content_clean_cache)
+        self.assertContains(response, 'Author_Changed')
 
     # Subscriptions tests
     def test_user_is_able_to_subscribe(self):
@@ -301,3 +308,86 @@ class PostPagesTests(TestCase):
         response = self.author_2_client.get(reverse('posts:follow_index'))
         post = response.context['page_obj']
         self.assertFalse(post)
+
+
+class PostDetailQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(title='first group',
+                                         description='test_description',
+                                         slug='first_slug')
+        cls.post = Post.objects.create(text='Author_First',
+                                       author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def add_comments(self, number):
+        start = Comment.objects.count()
+        for num in range(start, start + number):
+            commenter = User.objects.create_user(username=f'Commenter_{num}')
+            Comment.objects.create(post=self.post, author=commenter,
+                                   text=f'Comment_{num}')
+
+    def get_detail(self):
+        cache.clear()
+        return self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+
+    def test_post_detail_queries_do_not_grow_with_comments(self):
+        """
+        Число запросов post_detail не зависит от числа комментариев
+        """
+        self.add_comments(1)
+        # the first view seeds the author statistics
+        self.get_detail()
+        with CaptureQueriesContext(connection) as few:
+            self.get_detail()
+        self.add_comments(20)
+        with self.assertNumQueries(len(few.captured_queries)):
+            response = self.get_detail()
+        self.assertContains(response, 'Comment_20')
+
+    @override_settings(COMMENTS_ON_PAGE=5)
+    def test_post_detail_comments_are_paginated(self):
+        """
+        Комментарии выводятся постранично
+        """
+        self.add_comments(7)
+        response = self.get_detail()
+        self.assertEqual(len(response.context['comments_page']), 5)
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+            + '?comments_page=2'
+        )
+        self.assertEqual(len(response.context['comments_page']), 2)
+
+
+class PostCardLinksTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def test_links_follow_the_script_prefix(self):
+        """Ссылки карточек строятся при каждом рендере, с текущим префиксом"""
+        self.assertEqual(with_links([self.post])[0].author_url,
+                         '/profile/Author/')
+        set_script_prefix('/blog/')
+        self.addCleanup(set_script_prefix, '/')
+        self.assertEqual(with_links([self.post])[0].author_url,
+                         '/blog/profile/Author/')
+
+    def test_cards_render_in_one_template(self):
+        """Карточки страницы рендерятся одним шаблоном, без include на пост"""
+        Post.objects.create(text='Второй пост', author=self.author)
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        self.assertTemplateUsed(response, 'posts/includes/post_list.html',
+                                count=1)
+        self.assertContains(response, '<article>', count=2)
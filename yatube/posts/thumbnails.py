@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds a scheduled image is not scheduled again by page views
+QUEUED_TIMEOUT = 5 * 60
+
+_executor = None
+
+GENERATE_SECONDS = metrics.Histogram(
+    'yatube_thumbnail_seconds', 'Time to render one thumbnail preset.',
+    ('preset', 'result'))
+
+
+def _pool():
+    # created lazily, so every forked web worker gets its own threads
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails')
+    return _executor
+
+
+def _key(name, preset):
+    # the preset's definition is part of the key, so editing a preset
+    # sends its images back to the pool
+    definition = repr(settings.THUMBNAIL_PRESETS[preset])
+    digest = hashlib.md5(f'{name}|{preset}|{definition}'.encode())
+    return f'thumbnail:{digest.hexdigest()}'
+
+
+def generate(name):
+    """Renders every preset of one image; runs outside of requests"""
+    for preset, (geometry, options) in settings.THUMBNAIL_PRESETS.items():
+        start, result = time.perf_counter(), 'ok'
+        try:
+            thumbnail = get_thumbnail(name, geometry, **options)
+            # remembered for lookup(), which must not ask sorl to resize;
+            # sorl returns an unsized thumbnail when the source is gone
+            if thumbnail.size is not None:
+                cache.set(_key(name, preset),
+                          (thumbnail.name, thumbnail.size), None)
+        except Exception:
+            result = 'error'
+            logger.exception('Thumbnail of %s at %s failed', name, geometry)
+        GENERATE_SECONDS.observe(time.perf_counter() - start,
+                                 preset=preset, result=result)
+    cache.delete(f'thumbnail-queued:{name}')
+
+
+def forget(name):
+    """Drops what lookup() knows of an image, e.g. once it is deleted"""
+    cache.delete_many([_key(name, preset)
+                       for preset in settings.THUMBNAIL_PRESETS])
+
+
+def _refresh(name):
+    """Renders the presets; pages cached with the original are re-rendered"""
+    from . import caching
+    from .models import Post
+    generate(name)
+    for pk, group_id, author_id in Post.objects.filter(
+            image=name).values_list('pk', 'group_id', 'author_id'):
+        caching.bump(*caching.post_scopes(pk, group_id, author_id))
+        caching.bump_followers(author_id)
+
+
+def _generate_and_refresh(name):
+    try:
+        _refresh(name)
+    finally:
+        # pool threads open their own connection; do not leak it
+        connection.close()
+
+
+def schedule(name):
+    """Queues generate(name) for the pool once the transaction commits"""
+    if not name or not cache.add(f'thumbnail-queued:{name}', True,
+                                 QUEUED_TIMEOUT):
+        return
+    if settings.THUMBNAIL_SYNC:
+        transaction.on_commit(lambda: _refresh(name))
+        return
+    transaction.on_commit(
+        lambda: _pool().submit(_generate_and_refresh, name))
+
+
+def _generate_in_thread(name):
+    try:
+        generate(name)
+    finally:
+        connection.close()
+    return name
+
+
+def generate_many(names, workers=None):
+    """Renders the presets of many images in parallel; yields the names"""
+    with ThreadPoolExecutor(
+            max_workers=workers or settings.THUMBNAIL_WORKERS) as pool:
+        yield from pool.map(_generate_in_thread, names)
+
+
+def lookup(image, preset):
+    """The ready thumbnail of image, or None; never resizes anything.
+
+    A missing thumbnail is queued for the pool, so only the first few
+    views after an upload fall back to the original file.
+    """
+    if not image:
+        return None
+    ready = cache.get(_key(image.name, preset))
+    if ready is None:
+        schedule(image.name)
+        return None
+    name, size = ready
+    thumbnail = ImageFile(name, default.storage)
+    thumbnail.set_size(size)
+    return thumbnail
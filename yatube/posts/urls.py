@@ -6,6 +6,7 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('search/', views.search_posts, name='search'),
     # urls about groups
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     # urls about users
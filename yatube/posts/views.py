@@ -1,59 +1,144 @@
+from urllib.parse import urlencode
+
+from . import caching, counters, feed, search, stats
 from .paginator import paginate_page
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
 from django.shortcuts import render, get_object_or_404, redirect
 from .models import Post, Group, Follow, User
 from .forms import PostForm, CommentForm
 
 
+def _index_scopes():
+    return [caching.INDEX_SCOPE, *caching.CARD_SCOPES]
+
+
+def _group_scopes(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is not None:
+        return [caching.group_scope(group_id), *caching.CARD_SCOPES]
+
+
+def _profile_scopes(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is not None:
+        return [caching.author_scope(author_id), *caching.CARD_SCOPES]
+
+
+def _post_scopes(post_id):
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True).first()
+    if author_id is not None:
+        # the page also shows the author's numbers, the group and image
+        return [caching.post_scope(post_id), caching.author_scope(author_id),
+                *caching.CARD_SCOPES]
+
+
+@caching.guest_page(_index_scopes)
 def index(request):
     """Shows latest posts on main page"""
+    # versions first: a lagging replica is not read under a new one
+    cache_version = caching.versions(caching.INDEX_SCOPE,
+                                     *caching.CARD_SCOPES)
     post_list = Post.objects.select_related('author', 'group')
-    page_obj = paginate_page(request, post_list)
+    page_obj = paginate_page(request, post_list, counters.GLOBAL_SCOPE)
     return render(
         request,
         'posts/index.html',
-        context={'page_obj': page_obj, }
+        context={
+            'page_obj': page_obj,
+            'cache_version': cache_version,
+            'cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+        }
+    )
+
+
+def search_posts(request):
+    """Shows posts matching the words of ?q=, best matches first"""
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search.SearchResults(query), settings.PAGE_ON_SIZE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(
+        request,
+        'posts/search.html',
+        context={
+            'query': query,
+            'max_hits': settings.SEARCH_MAX_HITS,
+            'page_obj': page_obj,
+            'page_query': urlencode({'q': query}) + '&',
+        }
     )
 
 
+@caching.guest_page(_group_scopes)
 def group_posts(request, slug):
     """Shows posts which are related to the certain group"""
     group = get_object_or_404(Group, slug=slug)
+    cache_version = caching.versions(caching.group_scope(group.pk),
+                                     *caching.CARD_SCOPES)
     group_post_list = group.posts.select_related('author', 'group')
-    page_obj = paginate_page(request, group_post_list)
+    page_obj = paginate_page(request, group_post_list,
+                             counters.group_scope(group.pk))
     return render(
         request,
         'posts/group_list.html',
-        context={'group': group,
-                 'page_obj': page_obj, }
+        context={
+            'group': group,
+            'page_obj': page_obj,
+            'cache_version': cache_version,
+            'cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+        }
     )
 
 
+@caching.guest_page(_profile_scopes)
 def profile(request, username):
     """Shows posts which are related to the certain user"""
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    cache_version = caching.versions(caching.author_scope(author.pk),
+                                     *caching.CARD_SCOPES)
+    author_stats = stats.for_author(author)
     post_list = author.posts.select_related('author', 'group')
-    page_obj = paginate_page(request, post_list)
+    page_obj = paginate_page(request, post_list,
+                             counters.author_scope(author.pk),
+                             author_stats.posts_count)
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user,
         author=author).exists()
     context = {
         'author': author,
+        'author_stats': author_stats,
         'page_obj': page_obj,
         'following': following,
+        'cache_version': cache_version,
+        'cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@caching.guest_page(_post_scopes)
 def post_detail(request, post_id):
     """Shows one post and its author information"""
-    post = get_object_or_404(Post, id=post_id)
+    cache_version = caching.version(caching.post_scope(post_id))
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
+    comments = Paginator(
+        post.comments.select_related('author'), settings.COMMENTS_ON_PAGE
+    ).get_page(request.GET.get('comments_page'))
     form = CommentForm(request.POST or None)
     return render(request,
                   'posts/post_detail.html',
                   context={
                       'form': form,
                       'post': post,
+                      'author_stats': stats.for_author(post.author),
+                      'comments_page': comments,
+                      'cache_version': cache_version,
+                      'cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
                   })
 
 
@@ -114,13 +199,26 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     """Shows posts only of authors the user is subscribed to"""
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginate_page(request, posts)
+    cache_version = caching.versions(caching.feed_scope(request.user.pk),
+                                     *caching.CARD_SCOPES)
+    pulled = feed.pulled_authors(request.user)
+    if pulled:
+        # posts of pulled authors bump their author scope, not the feeds
+        # of their followers
+        cache_version += ':' + caching.versions(
+            *map(caching.author_scope, pulled))
+    posts = feed.feed_posts(request.user, pulled).select_related(
+        'author', 'group')
+    page_obj = paginate_page(request, posts,
+                             counters.follow_scope(request.user.pk,
+                                                   cache_version))
     return render(
         request,
-        'posts/index.html',
+        'posts/follow.html',
         context={
             'page_obj': page_obj,
+            'cache_version': cache_version,
+            'cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
         }
     )
 
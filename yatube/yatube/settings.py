@@ -1,12 +1,20 @@
 import os
+
 from dotenv import load_dotenv
 load_dotenv()
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# The shared caches and the metrics files; the tests use a directory of
+# their own (yatube/settings_test.py)
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+
 SECRET_KEY = str(os.getenv('SECRET_KEY'))
 
-DEBUG = str(os.getenv('DEBUG'))
+# DEBUG is a flag: only DEBUG=1, true or yes turn it on. An unset or any
+# other value leaves it off, and with it debug templates and the serving
+# of MEDIA_ROOT by runserver (urls.py); set DEBUG=1 for local development
+DEBUG = os.getenv('DEBUG', '').lower() in ('1', 'true', 'yes')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
@@ -41,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,17 +58,30 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
+# Templates are parsed once per process and rendered without debug
+# bookkeeping unless DEBUG is on; FAST_TEMPLATES=0 re-reads every file, for
+# editing them
+FAST_TEMPLATES = os.getenv('FAST_TEMPLATES', '1') == '1'
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'debug': DEBUG or not FAST_TEMPLATES,
+            'loaders': ([('django.template.loaders.cached.Loader',
+                          TEMPLATE_LOADERS)]
+                        if FAST_TEMPLATES else TEMPLATE_LOADERS),
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -73,13 +96,50 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
+# Production SQLite profile: core.db runs SQLITE_PRAGMAS on every new
+# connection, and connections live across requests for CONN_MAX_AGE
+# seconds. WAL lets readers work while one process writes; transactions
+# begin IMMEDIATE (core.sqlite3), so a writer waits up to SQLITE_TIMEOUT
+# seconds for the lock instead of failing with "database is locked".
+# SQLITE_TUNING=0 falls back to SQLite's and Python's defaults
+SQLITE_TUNING = os.getenv('SQLITE_TUNING', '1') == '1'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+} if SQLITE_TUNING else {}
+# sqlite3.connect(timeout=), the busy timeout; Python's default is 5
+SQLITE_TIMEOUT = 20
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': ('core.sqlite3' if SQLITE_TUNING
+                   else 'django.db.backends.sqlite3'),
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600 if SQLITE_TUNING else 0,
+        'OPTIONS': {'timeout': SQLITE_TIMEOUT} if SQLITE_TUNING else {},
     }
 }
 
+# Read replicas: DATABASE_REPLICAS lists database files (or names) that
+# become the aliases replica1, replica2...; the reads of requests go to
+# one of them and writes to 'default' (core.routers). A user who wrote
+# reads from the primary for REPLICA_PIN_SECONDS. Locally, copies of
+# db.sqlite3 made by `manage.py sync_replicas` stand in for replicas
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+        filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')),
+        start=1):
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'], NAME=name.strip(),
+        TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE = 'read_primary'
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -114,14 +174,118 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PAGE_ON_SIZE = 10
+COMMENTS_ON_PAGE = 50
+
+# 'offset' keeps numbered pages, 'cursor' switches every list to keyset
+# pagination; a single list opts in with the ?cursor= query parameter
+PAGINATION_MODE = 'offset'
 
-REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'my_project.my_app.pagination.CustomPagination',
-    'PAGE_ON_SIZE': 10
+# Seconds a live-counted total (e.g. a follow feed) is kept; it is keyed on
+# the version of what it counts, so this only bounds stale keys
+POST_COUNT_CACHE_TIMEOUT = 60
+
+# Posts are pushed into followers' feeds on publication; authors with more
+# followers than FEED_FANOUT_LIMIT are pulled by the feed at read time
+FEED_FANOUT_LIMIT = 1000
+FEED_BATCH_SIZE = 500
+
+# Cached fragments vary on the versions of the scopes they show (posts.caching)
+# and signals bump those versions on every write, so they can live for hours
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Anonymous visitors get whole pages from the cache (posts.caching.guest_page)
+# and 304 answers to conditional GETs; the pages vary on the same scope
+# versions as the fragments
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE', '1') == '1'
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Thumbnails of every preset are rendered by a thread pool after an upload
+# (posts.thumbnails); templates only look them up and never resize
+THUMBNAIL_PRESETS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
 }
+THUMBNAIL_WORKERS = 2
+# True renders in the saving thread instead of the pool; the tests do
+THUMBNAIL_SYNC = False
+
+# Uploads are rejected above these limits, then downscaled to
+# IMAGE_MAX_SIDE and re-encoded without metadata (posts.images)
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+IMAGE_MAX_SIDE = 2048
+IMAGE_QUALITY = 80
+
+# /search/ ranks the SEARCH_CANDIDATES newest matches of a query, so a
+# common word costs a bounded sort, and pages through only the
+# SEARCH_MAX_HITS best of them (posts.search)
+SEARCH_CANDIDATES = 10000
+SEARCH_MAX_HITS = 1000
 
+# Admin changelists count at most this many filtered rows and estimate
+# the size of unfiltered tables (posts.admin)
+ADMIN_COUNT_LIMIT = 10000
+
+# core.middleware.ProfilingMiddleware: per-request SQL, template and cache
+# numbers in a Server-Timing header and a log line. A view may run at most
+# QUERY_BUDGETS[url name] queries with a cold cache once its counters are
+# seeded; over budget is logged, or raises under QUERY_BUDGETS_STRICT, which
+# is on in tests (yatube/settings_test.py, posts/tests/test_budgets.py)
+PROFILING_ENABLED = os.getenv('PROFILING', '') == '1'
+QUERY_BUDGETS = {
+    'posts:index': 3,
+    'posts:group_list': 4,
+    'posts:profile': 3,
+    'posts:post_detail': 4,
+    'posts:follow_index': 5,
+    'posts:search': 3,
+}
+QUERY_BUDGETS_STRICT = False
+
+# /api/v1/ (posts.api): rows per page by default and at most (?limit=)
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# NDJSON imports (posts.ingest) write this many records per transaction
+INGEST_BATCH_SIZE = 500
+# Exports (posts.export) fetch this many rows from the database at a time
+EXPORT_CHUNK_SIZE = 2000
+
+# SQLite files shared by every worker process, so a fragment rendered by
+# one gunicorn worker is served by all of them; each evicts its own LRU
+# entries. {% cache %} fragments have a file of their own, so that their
+# churn never evicts the scope versions and counters of 'default', and
+# their hits are counted apart in the metrics (LABEL)
+CACHE_LOCATION = os.getenv(
+    'CACHE_LOCATION', os.path.join(CACHE_DIR, 'cache.sqlite3')
+)
+FRAGMENT_CACHE_LOCATION = os.getenv(
+    'FRAGMENT_CACHE_LOCATION', os.path.join(CACHE_DIR, 'fragments.sqlite3')
+)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
+    },
+    'template_fragments': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': FRAGMENT_CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+            'LABEL': 'fragments',
+        },
+    },
 }
+
+# core.metrics: counters and histograms of every worker process, summed
+# from METRICS_DIR at /metrics (staff only, or a scraper sending
+# "Authorization: Bearer <METRICS_TOKEN>"); a serving process writes its
+# numbers at most every METRICS_FLUSH_INTERVAL seconds and on exit. Empty
+# the directory on deploys, like a restart of the counters
+METRICS_ENABLED = os.getenv('METRICS', '1') == '1'
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(CACHE_DIR, 'metrics'))
+METRICS_FLUSH_INTERVAL = 10
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
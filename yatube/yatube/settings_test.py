@@ -0,0 +1,25 @@
+"""Settings of manage.py test and pytest"""
+import atexit
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES
+
+# The shared caches live in a directory of their own, removed at exit, so
+# that test data never reaches the developer's cache/ and clearing the
+# cache in tests never wipes it
+CACHE_DIR = tempfile.mkdtemp(prefix='yatube-tests-')
+atexit.register(shutil.rmtree, CACHE_DIR, ignore_errors=True)
+CACHE_LOCATION = os.path.join(CACHE_DIR, 'cache.sqlite3')
+FRAGMENT_CACHE_LOCATION = os.path.join(CACHE_DIR, 'fragments.sqlite3')
+CACHES['default']['LOCATION'] = CACHE_LOCATION
+CACHES['template_fragments']['LOCATION'] = FRAGMENT_CACHE_LOCATION
+METRICS_DIR = os.path.join(CACHE_DIR, 'metrics')
+
+# The in-memory SQLite test database makes threads lock each other's
+# tables instead of waiting, so thumbnails render in the saving thread
+THUMBNAIL_SYNC = True
+# A view over its query budget fails the test
+QUERY_BUDGETS_STRICT = True